@@ -1,22 +1,68 @@
-import gradio as gr
-import cv2
 import json
 import time
+STARTUP_T0 = time.perf_counter()
 import threading
 import sys
 import os
 import re
 import queue
+import itertools
+import heapq
+import hashlib
+import sqlite3
+import atexit
+import importlib
+import argparse
+import tempfile
+import tracemalloc
+import bisect
+import http.server
+from pathlib import Path
+from collections import OrderedDict, Counter, deque
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
 import numpy as np
-import sounddevice as sd
-import mss
-import scipy.signal
-import pandas as pd
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
-from google import genai
-from kittentts import KittenTTS
-from rapidocr_onnxruntime import RapidOCR
+
+# --- LAZY IMPORTS ---
+# The heavy modules are imported on first use so the window comes up without
+# waiting on all of them; start_warmup() then touches them in the background.
+# import_times records how long each module took to import.
+import_times = {}
+
+class _LazyModule:
+    def __init__(self, module, attr=None):
+        self._module = module
+        self._attr = attr
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    t0 = time.perf_counter()
+                    target = importlib.import_module(self._module)
+                    import_times.setdefault(self._module, time.perf_counter() - t0)
+                    self._target = getattr(target, self._attr) if self._attr else target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+gr = _LazyModule("gradio")
+cv2 = _LazyModule("cv2")
+sd = _LazyModule("sounddevice")
+mss = _LazyModule("mss")
+sp_signal = _LazyModule("scipy.signal")
+pd = _LazyModule("pandas")
+sync_playwright = _LazyModule("playwright.sync_api", "sync_playwright")
+genai = _LazyModule("google.genai")
+KittenTTS = _LazyModule("kittentts", "KittenTTS")
+RapidOCR = _LazyModule("rapidocr_onnxruntime", "RapidOCR")
+WARMUP_MODULES = [cv2, sp_signal, pd, sd, mss, RapidOCR, KittenTTS, sync_playwright, genai]
 
 # --- LOAD SECRETS ---
 load_dotenv()
@@ -24,14 +70,30 @@ GEMINI_KEY = os.getenv("GEMINI_API_KEY")
 
 # --- GLOBAL STATE ---
 is_running = False
-seen_players = {}
+audio_enabled = True   # False for benchmark / headless runs
+lookups_enabled = True
+event_sink = None      # headless runs write one JSON object per event here
+event_context = {}     # merged into every event (e.g. the replay frame)
+event_lock = threading.Lock()
 ocr_engine = None
 tts_model = None
-console_log = []
-HISTORY_FILE = "daily_history.json"
+console_log = deque(maxlen=50)   # newest last
+HISTORY_FILE = "daily_history.json"   # legacy format, migrated into HISTORY_DB
+HISTORY_DB = "history.db"
+CACHE_FILE = "lookup_cache.json"
 
 # --- SEARCH QUEUE ---
-search_queue = queue.Queue()
+# Served by a pool of lookup workers. Lower priority value runs first, so a
+# death-screen killer jumps ahead of proximity names. A name that is already
+# queued or in flight is never queued twice.
+LOOKUP_PRIORITY = {"Death": 0, "Proximity": 1}
+search_queue = queue.PriorityQueue()
+queued_names = {}     # name -> priority of its live queue entry
+inflight_names = set()
+queue_lock = threading.Lock()
+job_counter = itertools.count()
+worker_threads = []
+queue_stats = {"served": 0, "deduped": 0, "wait_avg": 0.0, "service_avg": 0.0, "wait_max": 0.0}
 
 # Available Kitten Voices
 KITTEN_VOICES = [
@@ -49,10 +111,193 @@ DEFAULT_CONFIG = {
     "prox_x": 0, "prox_y": 730, "prox_w": 233, "prox_h": 152,
     "death_x": 990, "death_y": 580, "death_w": 600, "death_h": 300,
     "icon_crop": 65,
+    "gate_delta": 24,
+    "gate_min_pixels": 3,
+    "bounty_url": "https://speranzabounties.com/",
+    "browser_pages": 2,
+    "page_max_uses": 25,
+    "lookup_deadline": 10,
+    "lookup_workers": 2,
+    "cache_ttl_clean": 12 * 3600,
+    "cache_ttl_bounty": 72 * 3600,
+    "cache_max_entries": 5000,
+    "history_flush_interval": 2.0,
+    "cache_flush_interval": 5.0,
+    "tts_cache_mb": 64,
+    "tts_compose_fragments": True,
+    "tts_max_backlog": 4,
+    "tts_max_age": 20,
+    "audio_native_24k": False,
+    "ocr_workers": 2,
+    "prox_interval": 0.5,
+    "death_interval": 0.25,
+    "prox_ocr_mode": "rows",
+    "adaptive_capture": True,
+    "capture_rate_min": 0.5,
+    "capture_rate_max": 6.0,
+    "burst_seconds": 5,
+    "cpu_budget": 0.25,
+    "name_match_distance": 1,
+    "vote_frames": 3,
+    "vote_min_hits": 2,
+    "vote_still_conf": 0.9,
+    "gemini_model": "gemini-2.5-flash",
+    "gemini_concurrency": 2,
+    "gemini_batch_window": 0.4,
+    "gemini_batch_max": 4,
+    "gemini_timeout": 15,
+    "bench_tolerance": 0.2,
+    "metrics_port": 9464,
+    "history_page_size": 50,
+    "preprocess_mode": "fast",
+    "threshold_mode": "fixed",
+    "ocr_text_height": 40,
+    "ocr_scale_min": 1.0,
+    "ocr_scale_max": 3.0,
+    "active_profile": "default",
+    "combined_grab_max_ratio": 4.0,
+    # These match the standin/index.html markup. On a site whose markup they
+    # don't match no cards are found and lookups fall back to page text + Gemini.
+    "result_card_selector": ".target-card",
+    "result_name_selector": ".target-name",
+    "result_tag_selector": ".tag",
+    "result_text_selector": ".description",
 }
 
 config = DEFAULT_CONFIG.copy()
 
+# --- METRICS ---
+# Latency histograms per stage (optionally per region) and plain counters,
+# plus a trace ID per detected name that links the detection, its lookup and
+# its announcement in the log and feeds the end-to-end histogram. Exported
+# on 127.0.0.1:metrics_port as /metrics (Prometheus text) and /metrics.json.
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+METRIC_STAGES = ["grab", "preprocess", "ocr", "queue_wait", "browser", "gemini", "tts", "playback", "end_to_end"]
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.n = 0
+        self.recent = deque(maxlen=256)   # p50/p95 for the dashboard
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.n += 1
+        self.recent.append(ms)
+
+    def quantile(self, q):
+        if not self.recent: return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}   # (stage, region) -> Histogram
+        self.counters = Counter()
+        self.trace_seq = itertools.count(1)
+        self.traces = OrderedDict()   # name -> (trace id, started)
+
+    def observe(self, stage, seconds, region=""):
+        with self.lock:
+            hist = self.histograms.get((stage, region))
+            if hist is None: hist = self.histograms[(stage, region)] = Histogram()
+            hist.observe(seconds * 1000)
+
+    def inc(self, counter, n=1):
+        with self.lock:
+            self.counters[counter] += n
+
+    def start_trace(self, name):
+        with self.lock:
+            trace = (f"T{next(self.trace_seq)}", time.perf_counter())
+            self.traces[name] = trace
+            self.traces.move_to_end(name)
+            while len(self.traces) > 500: self.traces.popitem(last=False)
+            return trace[0]
+
+    def tag(self, name):
+        trace = self.traces.get(name)
+        return f" [{trace[0]}]" if trace else ""
+
+    def finish_trace(self, name):
+        with self.lock:
+            trace = self.traces.pop(name, None)
+        if trace: self.observe("end_to_end", time.perf_counter() - trace[1])
+        return f" [{trace[0]}]" if trace else ""
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": [
+                    {"stage": stage, "region": region, "count": h.n, "sum_ms": h.total,
+                     "p50_ms": h.quantile(0.5), "p95_ms": h.quantile(0.95),
+                     "buckets": dict(zip([str(b) for b in HISTOGRAM_BUCKETS_MS] + ["+Inf"], itertools.accumulate(h.counts)))}
+                    for (stage, region), h in self.histograms.items()
+                ],
+            }
+
+    def prometheus(self):
+        out = ["# TYPE goodboy_stage_ms histogram"]
+        with self.lock:
+            for (stage, region), h in self.histograms.items():
+                labels = f'stage="{stage}"' + (f',region="{region}"' if region else "")
+                for bound, count in zip([str(b) for b in HISTOGRAM_BUCKETS_MS] + ["+Inf"], itertools.accumulate(h.counts)):
+                    out.append(f'goodboy_stage_ms_bucket{{{labels},le="{bound}"}} {count}')
+                out.append(f"goodboy_stage_ms_sum{{{labels}}} {h.total:.3f}")
+                out.append(f"goodboy_stage_ms_count{{{labels}}} {h.n}")
+            for counter, value in sorted(self.counters.items()):
+                out.append(f"# TYPE goodboy_{counter}_total counter")
+                out.append(f"goodboy_{counter}_total {value}")
+        return "\n".join(out) + "\n"
+
+    def summary(self):
+        with self.lock:
+            hists = dict(self.histograms)
+            counters = dict(self.counters)
+        order = {stage: i for i, stage in enumerate(METRIC_STAGES)}
+        lines = []
+        for (stage, region), h in sorted(hists.items(), key=lambda item: (order.get(item[0][0], 99), item[0][1])):
+            label = f"{stage} ({region})" if region else stage
+            lines.append(f"{label:<22} p50 {h.quantile(0.5):8.1f} ms | p95 {h.quantile(0.95):8.1f} ms | n {h.n}")
+        if counters: lines.append(" | ".join(f"{k} {v}" for k, v in sorted(counters.items())))
+        return "\n".join(lines)
+
+metrics = Metrics()
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, ctype = metrics.prometheus(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, ctype = json.dumps(metrics.snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args): pass
+
+def start_metrics_server():
+    port = config.get("metrics_port", 9464)
+    if not port: return None
+    try:
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    except Exception as e:
+        log(f"Metrics Error: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log(f"Metrics on http://127.0.0.1:{port}/metrics")
+    return server
+
 # --- 1. CORE HELPERS ---
 
 def load_config():
@@ -63,6 +308,7 @@ def load_config():
                 saved = json.load(f)
                 config.update(saved)
         except: pass
+    migrate_profiles()
     return config
 
 def save_config_to_file():
@@ -71,48 +317,349 @@ def save_config_to_file():
             json.dump(config, f)
     except: pass
 
-def load_history():
-    global seen_players
-    if os.path.exists(HISTORY_FILE):
+# --- HISTORY STORE ---
+# Player history lives in SQLite (one row per player, indexed by name and by
+# time). A status change only hands the store the player's new record; a
+# background flusher writes all pending rows in one transaction at most
+# history_flush_interval seconds later, so no event pays for rewriting the
+# whole history.
+# On first open an existing daily_history.json is imported and renamed.
+class HistoryStore:
+    def __init__(self, path, legacy_path=None):
+        # legacy_path: old JSON history to import on first open (None: never)
+        self.path = path
+        self.legacy_path = legacy_path
+        self.conn = None
+        self.lock = threading.Lock()
+        self.dirty = {}   # name -> record to write (None: delete)
+        self.wake = threading.Event()
+        self.flusher = None
+
+    def open(self):
+        with self.lock:
+            if self.conn is not None: return
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS players (name TEXT PRIMARY KEY, time REAL, status TEXT, details TEXT, note TEXT)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_players_time ON players(time)")
+            self.conn.commit()
+            self._migrate_json()
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+
+    def _migrate_json(self):
+        if not self.legacy_path or not os.path.exists(self.legacy_path): return
+        if self.conn.execute("SELECT COUNT(*) FROM players").fetchone()[0] > 0: return
         try:
-            with open(HISTORY_FILE, 'r') as f:
-                seen_players = json.load(f)
-        except: seen_players = {}
-    return seen_players
+            with open(self.legacy_path, 'r') as f:
+                legacy = json.load(f)
+        except: return
+        rows = []
+        for name, info in legacy.items():
+            # Very old files stored just a timestamp per name
+            if not isinstance(info, dict): info = {"time": info, "status": "Unknown"}
+            rows.append((name, info.get("time", 0), info.get("status", "Unknown"), info.get("details", ""), info.get("note", "")))
+        self.conn.executemany("INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+        os.replace(self.legacy_path, self.legacy_path + ".migrated")
+        log(f"Migrated {len(rows)} players from {self.legacy_path}.")
 
-def save_history_disk():
-    try:
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(seen_players, f)
-    except: pass
+    def load_all(self):
+        self.open()
+        with self.lock:
+            rows = self.conn.execute("SELECT name, time, status, details, note FROM players ORDER BY time").fetchall()
+        return {r[0]: {"time": r[1], "status": r[2], "details": r[3], "note": r[4]} for r in rows}
+
+    def mark(self, name, record):
+        # record: the player's current record, or None to delete the row.
+        # Records are never changed in place, so keeping the reference is safe.
+        self.open()
+        with self.lock:
+            self.dirty[name] = record
+
+    def flush(self):
+        if self.conn is None: return
+        with self.lock:
+            pending, self.dirty = self.dirty, {}
+            if not pending: return
+            upserts, deletes = [], []
+            for name, info in pending.items():
+                if info is not None:
+                    upserts.append((name, info.get("time", 0), info.get("status", ""), info.get("details", ""), info.get("note", "")))
+                else:
+                    deletes.append((name,))
+            try:
+                with self.conn:
+                    self.conn.executemany("INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?, ?)", upserts)
+                    self.conn.executemany("DELETE FROM players WHERE name = ?", deletes)
+            except Exception as e:
+                # Anything marked since is newer and wins
+                for name, info in pending.items(): self.dirty.setdefault(name, info)
+                print(f"History Flush Error: {e}")
+
+    def clear(self):
+        self.open()
+        with self.lock:
+            self.dirty = {}
+            with self.conn:
+                self.conn.execute("DELETE FROM players")
+
+    def _flush_loop(self):
+        while True:
+            self.wake.wait(config.get("history_flush_interval", 2.0))
+            self.wake.clear()
+            self.flush()
+
+history_store = HistoryStore(HISTORY_DB, HISTORY_FILE)
+atexit.register(history_store.flush)
+
+# --- PLAYER STATE ---
+# Every player record lives here. Records are never changed in place: a
+# writer builds a new dict under the lock, swaps it in, bumps the version and
+# marks the name dirty for the store. That keeps get() lock-free and O(1) for
+# the per-line re-encounter check (a reader sees the old or the new record,
+# never a half-written one). snapshot() gives the UI a copy that is reused
+# until the next change.
+class PlayerState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = {}
+        self.version = 0
+        self._snapshot = (-1, {})
+
+    def get(self, name):
+        return self.records.get(name)
+
+    def __contains__(self, name):
+        return name in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def load(self, records):
+        with self.lock:
+            self.records = dict(records)
+            self.version += 1
+
+    def update(self, name, **fields):
+        # Returns True if the player is new
+        with self.lock:
+            old = self.records.get(name)
+            record = dict(old) if old else {"time": time.time(), "status": "Unknown", "details": "", "note": ""}
+            record.update(fields)
+            self.records[name] = record
+            self.version += 1
+        history_store.mark(name, record)
+        return old is None
+
+    def clear(self):
+        with self.lock:
+            self.records = {}
+            self.version += 1
+
+    def snapshot(self):
+        cached = self._snapshot
+        if cached[0] == self.version: return cached[1]
+        with self.lock:
+            self._snapshot = (self.version, dict(self.records))
+            return self._snapshot[1]
+
+    def summary(self):
+        return f"Players: {len(self.records)} records | version {self.version}"
+
+players = PlayerState()
+
+# --- NAME INDEX ---
+# OCR reads the same player as "Raider_01", "Raider_0l" or "Raicler_01". Every
+# read is reduced to a canonical form (case, separators and the usual OCR
+# confusables folded together) and then matched against known players, first
+# exactly and then within name_match_distance edits. Fuzzy candidates come from
+# a symmetric-delete index (every name stored under each string reachable by
+# up to N deletions), so a lookup is a handful of dict probes no matter how
+# large the history grows.
+CONFUSABLE_SEQS = [("RN", "M"), ("CL", "D"), ("VV", "W")]
+CONFUSABLE_CHARS = str.maketrans({"O": "0", "Q": "0", "I": "1", "L": "1", "|": "1", "S": "5", "B": "8", "Z": "2"})
+FUZZY_MIN_LEN = 5  # shorter names only ever match exactly
+
+def clean_name(text):
+    return ''.join(e for e in text if e.isalnum() or e == '_' or e == '-')
+
+def canonical_name(name):
+    canon = ''.join(e for e in name.upper() if e.isalnum() or e == '|')
+    for seq, repl in CONFUSABLE_SEQS: canon = canon.replace(seq, repl)
+    return canon.translate(CONFUSABLE_CHARS)
+
+def name_distance(a, b, limit):
+    # Levenshtein, except swapping one digit for another costs 2: OCR rarely
+    # does that, and "Raider_01" vs "Raider_02" are usually two real players.
+    if abs(len(a) - len(b)) > limit: return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            sub = 0 if ca == cb else (2 if ca.isdigit() and cb.isdigit() else 1)
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + sub))
+        if min(cur) > limit: return limit + 1
+        prev = cur
+    return prev[-1]
+
+def _deletes(word, depth):
+    out = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+class NameIndex:
+    def __init__(self):
+        self.by_canon = {}   # canonical -> player key
+        self.deletes = {}    # delete variant -> set of canonicals
+        self.memo = {}       # raw read -> resolved key
+        self.lock = threading.Lock()
+        self.merged = 0
+
+    def _depth(self):
+        return max(0, min(2, int(config.get("name_match_distance", 1))))
+
+    def add(self, key):
+        canon = canonical_name(key)
+        if not canon: return
+        with self.lock:
+            if canon in self.by_canon: return
+            self.by_canon[canon] = key
+            if len(canon) >= FUZZY_MIN_LEN:
+                for variant in _deletes(canon, self._depth()):
+                    self.deletes.setdefault(variant, set()).add(canon)
+            self.memo.clear()
+
+    def remove(self, key):
+        canon = canonical_name(key)
+        with self.lock:
+            if self.by_canon.get(canon) != key: return
+            del self.by_canon[canon]
+            for variant in _deletes(canon, self._depth()):
+                bucket = self.deletes.get(variant)
+                if bucket:
+                    bucket.discard(canon)
+                    if not bucket: del self.deletes[variant]
+            self.memo.clear()
+
+    def match(self, name):
+        # Known player key for this read, or None
+        canon = canonical_name(name)
+        with self.lock:
+            key = self.by_canon.get(canon)
+            if key is not None or len(canon) < FUZZY_MIN_LEN: return key
+            depth = self._depth()
+            best, best_d = None, depth + 1
+            candidates = set()
+            for variant in _deletes(canon, depth):
+                candidates |= self.deletes.get(variant, set())
+            for cand in candidates:
+                d = name_distance(canon, cand, depth)
+                if d < best_d or (d == best_d and best is not None and cand < best):
+                    best, best_d = cand, d
+            return self.by_canon[best] if best is not None else None
+
+    def resolve(self, raw):
+        # Cleaned read mapped onto an existing player when it is a near-match
+        hit = self.memo.get(raw)
+        if hit is not None: return hit
+        name = clean_name(raw)
+        key = self.match(name) or name
+        if len(self.memo) > 5000: self.memo.clear()
+        self.memo[raw] = key
+        return key
+
+    def rebuild(self, players):
+        # Re-index the history, merging records that turn out to be the same
+        # player into the first-seen spelling. The latest verdict wins and
+        # notes from both are kept. Works on the plain dict being loaded and
+        # returns the names whose stored rows changed.
+        changed = []
+        with self.lock:
+            self.by_canon, self.deletes, self.memo = {}, {}, {}
+        for name in sorted(players, key=lambda n: _record_time(players[n])):
+            target = self.match(name)
+            if target is None or target == name:
+                self.add(name)
+                continue
+            dup = players.pop(name)
+            keep = players[target]
+            if isinstance(dup, dict) and isinstance(keep, dict):
+                keep["time"] = max(keep.get("time", 0), dup.get("time", 0))
+                if dup.get("status") in ("Clean", "Bounty"):
+                    keep["status"], keep["details"] = dup["status"], dup.get("details", "")
+                if dup.get("note") and dup.get("note") != keep.get("note"):
+                    keep["note"] = " | ".join(n for n in (keep.get("note"), dup["note"]) if n)
+                changed.append(target)
+            changed.append(name)
+            self.merged += 1
+            log(f"Merged {name} into {target}.")
+        return changed
+
+    def summary(self):
+        return f"Names: {len(self.by_canon)} indexed | {self.merged} merged"
+
+def _record_time(info):
+    return info.get("time", 0) if isinstance(info, dict) else info
+
+name_index = NameIndex()
+
+history_loaded = False
+
+def load_history():
+    global history_loaded
+    try: records = history_store.load_all()
+    except Exception as e:
+        log(f"History Error: {e}")
+        records = {}
+    # Very old histories stored just a timestamp per name
+    records = {name: info if isinstance(info, dict) else {"time": info, "status": "Unknown", "details": "", "note": ""} for name, info in records.items()}
+    changed = name_index.rebuild(records)
+    players.load(records)
+    for name in changed: save_history(name)
+    history_loaded = True
+    return players
+
+def ensure_history():
+    # History lives in memory once loaded; reloading would drop unflushed edits
+    if not history_loaded: load_history()
+    return players
+
+def save_history(name):
+    history_store.mark(name, players.get(name))
 
 def update_player_data(name, status, details=None):
-    if name not in seen_players:
-        seen_players[name] = {"time": time.time(), "status": status, "details": details or "", "note": ""}
-    else:
-        seen_players[name]["time"] = time.time()
-        seen_players[name]["status"] = status
-        if details: seen_players[name]["details"] = details
-    save_history_disk()
+    fields = {"time": time.time(), "status": status}
+    if details: fields["details"] = details
+    if players.update(name, **fields): name_index.add(name)
 
 def add_user_note(name, note):
-    if name in seen_players:
-        seen_players[name]["note"] = note
-        save_history_disk()
+    name = name_index.match(name) or name
+    if name in players:
+        players.update(name, note=note)
         log(f"Note added for {name}")
         return f"Saved note for {name}."
     else:
-        seen_players[name] = {"time": time.time(), "status": "Manual Entry", "details": "", "note": note}
-        save_history_disk()
+        players.update(name, status="Manual Entry", note=note)
+        name_index.add(name)
         return f"Created entry for {name}."
 
 def log(msg):
     timestamp = time.strftime("%H:%M:%S")
     entry = f"[{timestamp}] {msg}"
-    console_log.insert(0, entry)
-    if len(console_log) > 50: console_log.pop()
+    console_log.append(entry)
     print(entry)
-    return "\n".join(console_log)
+    return entry
+
+def emit(kind, **fields):
+    if event_sink is None: return
+    record = {"event": kind, "time": round(time.time(), 3), **event_context, **fields}
+    with event_lock:
+        event_sink.write(json.dumps(record) + "\n")
+        event_sink.flush()
 
 def get_audio_devices():
     try:
@@ -134,59 +681,594 @@ def get_monitor_list():
         return mon_list
     except: return ["1: Default"]
 
+def monitor_count():
+    # Number of real monitors, or None when the screen can't be queried
+    try:
+        with mss.mss() as sct_temp: return len(sct_temp.monitors) - 1
+    except: return None
+
 # --- 2. AI ENGINES & WORKER ---
 
-def init_engines():
+# --- STARTUP ---
+# Models load on a warm-up thread started with the UI, so START normally finds
+# them ready. init_engines is still what the loop calls; the lock makes it
+# wait for a warm-up already in progress instead of loading twice.
+readiness = {"Imports": "waiting", "OCR": "waiting", "TTS": "waiting"}
+startup_times = {}   # step -> seconds
+spare_ocr_engines = []
+engine_lock = threading.Lock()
+
+def init_engines(tts=True):
     global ocr_engine, tts_model
-    if ocr_engine is None:
-        log("Loading RapidOCR...")
-        ocr_engine = RapidOCR()
+    with engine_lock:
+        if ocr_engine is None:
+            log("Loading RapidOCR...")
+            readiness["OCR"] = "loading"
+            t0 = time.perf_counter()
+            ocr_engine = RapidOCR()
+            # First inference initializes the session; do it before a match does
+            ocr_engine.text_rec([np.zeros((48, 192, 3), dtype=np.uint8)])
+            # Extra engines for the other OCR threads
+            while len(spare_ocr_engines) < config.get("ocr_workers", 2) - 1:
+                spare_ocr_engines.append(RapidOCR())
+            startup_times["OCR load"] = time.perf_counter() - t0
+            readiness["OCR"] = "ready"
+        
+        if tts and tts_model is None:
+            log("Loading KittenTTS...")
+            readiness["TTS"] = "loading"
+            t0 = time.perf_counter()
+            try:
+                tts_model = KittenTTS("KittenML/kitten-tts-nano-0.2")
+                startup_times["TTS load"] = time.perf_counter() - t0
+                prerender_phrases()
+                startup_times["TTS warm-up"] = time.perf_counter() - t0 - startup_times["TTS load"]
+                readiness["TTS"] = "ready"
+            except Exception as e:
+                readiness["TTS"] = "failed"
+                log(f"TTS Error: {e}")
+
+def warmup():
+    readiness["Imports"] = "loading"
+    for module in WARMUP_MODULES:
+        try: module._load()
+        except Exception as e: log(f"Import Error ({module._module}): {e}")
+    readiness["Imports"] = "ready"
+    try: init_engines()
+    except Exception as e:
+        readiness["OCR"] = "failed"
+        log(f"OCR Error: {e}")
+    startup_times["Warm-up total"] = time.perf_counter() - STARTUP_T0
+    for line in startup_report().splitlines(): log(line)
+
+def start_warmup():
+    threading.Thread(target=warmup, daemon=True).start()
+
+def startup_report():
+    lines = [" | ".join(f"{step} {sec:.2f}s" for step, sec in startup_times.items())]
+    slowest = sorted(import_times.items(), key=lambda item: -item[1])
+    lines.append("Imports: " + ", ".join(f"{name} {sec * 1000:.0f}ms" for name, sec in slowest))
+    return "\n".join(lines)
+
+def get_readiness_display():
+    state = " | ".join(f"{part}: {status}" for part, status in readiness.items())
+    return state + "\n" + startup_report()
+
+# --- LOOKUP CACHE ---
+# Remembers final verdicts so a player we checked recently is announced
+# straight away without a browser or Gemini call. Two kinds of keys share one
+# LRU: "name:<NAME>" for the verdict on a player, and "page:<sha1>" for the
+# Gemini summary of a given (sanitized) result page, so an expired verdict
+# whose page hasn't changed skips the LLM. Clean and Bounty verdicts have
+# separate TTLs. Saved to CACHE_FILE so it survives restarts: a put only marks
+# the cache dirty, and a background flusher writes it at most every
+# cache_flush_interval seconds (and once more at exit).
+class LookupCache:
+    def __init__(self, path):
+        self.path = path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        self.wake = threading.Event()
+        self.flusher = None
+        self.io_lock = threading.Lock()   # one file write or read at a time
+
+    def load(self):
+        # Runs on every START: write out verdicts not flushed yet, or the
+        # reload would drop them
+        self.flush()
+        with self.io_lock, self.lock:
+            entries = OrderedDict()
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r') as f:
+                        for key, entry in json.load(f):
+                            entries[key] = entry
+                except: entries = OrderedDict()
+            if self.dirty:
+                # Put after the flush above: keep them on top
+                for key, entry in self.entries.items():
+                    entries[key] = entry
+                    entries.move_to_end(key)
+            self.entries = entries
+            self._expire()
+
+    def _mark_dirty(self):
+        # Caller holds the lock
+        self.dirty = True
+        if self.flusher is None:
+            self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self.flusher.start()
+
+    def flush(self):
+        with self.io_lock:
+            with self.lock:
+                if not self.dirty: return
+                self.dirty = False
+                items = list(self.entries.items())
+                path = self.path
+            try:
+                tmp = path + ".tmp"
+                with open(tmp, 'w') as f:
+                    json.dump(items, f)
+                os.replace(tmp, path)
+            except:
+                with self.lock: self.dirty = True
+
+    def _flush_loop(self):
+        while True:
+            self.wake.wait(config.get("cache_flush_interval", 5.0))
+            self.wake.clear()
+            self.flush()
+
+    def _ttl(self, status):
+        if status == "Clean": return config.get("cache_ttl_clean", 12 * 3600)
+        return config.get("cache_ttl_bounty", 72 * 3600)
+
+    def _expire(self):
+        now = time.time()
+        for key in [k for k, e in self.entries.items() if now - e["time"] > self._ttl(e["status"])]:
+            del self.entries[key]
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.time() - entry["time"] > self._ttl(entry["status"]):
+                del self.entries[key]
+                entry = None
+            if entry:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def _put(self, key, status, details):
+        with self.lock:
+            self.entries[key] = {"status": status, "details": details, "time": time.time()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > config.get("cache_max_entries", 5000):
+                self.entries.popitem(last=False)
+            self._mark_dirty()
+
+    def get(self, name):
+        return self._get("name:" + normalize_name(name))
+
+    def put(self, name, status, details):
+        self._put("name:" + normalize_name(name), status, details)
+
+    def get_page(self, content_hash):
+        return self._get("page:" + content_hash)
+
+    def put_page(self, content_hash, status, details):
+        self._put("page:" + content_hash, status, details)
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self._mark_dirty()
+        self.wake.set()
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return f"Cache: {len(self.entries)} entries | {self.hits} hits / {self.misses} misses ({rate:.0f}% hit)"
+
+lookup_cache = LookupCache(CACHE_FILE)
+atexit.register(lookup_cache.flush)
+
+def normalize_name(name):
+    return canonical_name(name)
+
+def announce_result(player_name, status, details, context="Proximity"):
+    update_player_data(player_name, status, details)
+    trace = metrics.finish_trace(player_name)
+    log(f"Announce: {player_name} {status}{trace}")
+    emit("verdict", name=player_name, status=status, details=details, context=context, trace=trace.strip(" []"))
+    metrics.inc("announcements")
+    if status == "Clean": speak(f"Raider {player_name} is not listed.", ["Raider", player_name, "is not listed."], context)
+    else: speak(details, priority=context)
+
+# --- WORKER POOL ---
+def enqueue_lookup(name, context="Proximity"):
+    if not lookups_enabled: return False
+    cached = lookup_cache.get(name)
+    if cached:
+        log(f"Cache hit: {name} is {cached['status']}.{metrics.tag(name)}")
+        metrics.inc("cache_hits")
+        announce_result(name, cached["status"], cached["details"], context)
+        return False
     
-    if tts_model is None:
-        log("Loading KittenTTS...")
-        try:
-            tts_model = KittenTTS("KittenML/kitten-tts-nano-0.2")
-            tts_model.generate("Warmup", voice=config.get("tts_voice", "expr-voice-2-f"))
-        except Exception as e: log(f"TTS Error: {e}")
+    prio = LOOKUP_PRIORITY.get(context, 1)
+    with queue_lock:
+        if name in inflight_names or queued_names.get(name, 99) <= prio:
+            queue_stats["deduped"] += 1
+            return False
+        # Either new, or a death job upgrading a queued proximity job; the
+        # older entry is dropped by the worker when it comes up.
+        queued_names[name] = prio
+    search_queue.put((prio, next(job_counter), time.time(), name, context))
+    return True
+
+def _track(key, value):
+    queue_stats[key] = value if queue_stats["served"] <= 1 else queue_stats[key] * 0.8 + value * 0.2
 
-# --- WORKER THREAD ---
 def queue_worker():
+    # Each worker owns one long-lived browser with a pool of warm pages
+    browser = BrowserService()
+    try: browser.start()
+    except Exception as e: log(f"Browser Error: {e}")
+    
     while True:
         try:
-            item = search_queue.get()
-            if item is None: break 
+            prio, _, queued_at, name, context = search_queue.get()
+            if name is None:
+                search_queue.task_done()
+                break
+            
+            with queue_lock:
+                if queued_names.get(name) != prio:
+                    search_queue.task_done()
+                    continue
+                del queued_names[name]
+                inflight_names.add(name)
             
-            name, context = item
-            check_bounty(name, context)
+            started = time.time()
+            try:
+                check_bounty(name, context, browser)
+            finally:
+                with queue_lock:
+                    inflight_names.discard(name)
+                    queue_stats["served"] += 1
+                    wait = started - queued_at
+                    metrics.observe("queue_wait", wait)
+                    _track("wait_avg", wait)
+                    _track("service_avg", time.time() - started)
+                    queue_stats["wait_max"] = max(queue_stats["wait_max"], wait)
             
             search_queue.task_done()
         except Exception as e:
             print(f"Worker Error: {e}")
+    
+    browser.stop()
 
-def speak(text):
-    if not text: return
-    text = re.sub(r'[*#_`\[\]]', '', text).strip()
-    log(f"VOICE: {text}")
+def start_workers():
+    worker_threads[:] = [t for t in worker_threads if t.is_alive()]
+    for _ in range(max(1, config.get("lookup_workers", 2)) - len(worker_threads)):
+        t = threading.Thread(target=queue_worker, daemon=True)
+        t.start()
+        worker_threads.append(t)
+
+def queue_summary():
+    with queue_lock:
+        inflight = len(inflight_names)
+        stats = dict(queue_stats)
+    return (f"Lookups: {search_queue.qsize()} queued | {inflight} in flight | {len(worker_threads)} workers\n"
+            f"Wait avg {stats['wait_avg']:.1f}s (max {stats['wait_max']:.1f}s) | Service avg {stats['service_avg']:.1f}s | "
+            f"Served {stats['served']} | Deduped {stats['deduped']}")
+
+# --- SPEECH CACHE ---
+# Ready-to-play 48 kHz float32 clips keyed by (voice, normalized text), evicted
+# LRU once the total size passes tts_cache_mb. The fixed phrases below are
+# rendered at init_engines time; templated lines are spoken as fragments
+# (e.g. "Raider" + name + "is not listed.") so only the name is synthesized live.
+STATIC_PHRASES = [
+    "Overlay Active.", "Raider", "is not listed.", "Killed by", "Checking record.",
+    "Re-encountering", "Still listed as Clean.", "History says:", "Your Note:",
+    "Warning. Bounty data found for", "Warning.", "has a record.",
+]
+FRAGMENT_GAP = 0.06  # seconds of silence between composed fragments
+
+class AudioCache:
+    def __init__(self):
+        self.clips = OrderedDict()
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            clip = self.clips.get(key)
+            if clip is None:
+                self.misses += 1
+                return None
+            self.clips.move_to_end(key)
+            self.hits += 1
+            return clip
+
+    def put(self, key, clip):
+        with self.lock:
+            if key in self.clips: self.bytes -= self.clips.pop(key).nbytes
+            self.clips[key] = clip
+            self.bytes += clip.nbytes
+            limit = config.get("tts_cache_mb", 64) * 1024 * 1024
+            while self.bytes > limit and len(self.clips) > 1:
+                self.bytes -= self.clips.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        with self.lock:
+            self.clips.clear()
+            self.bytes = 0
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return f"TTS cache: {len(self.clips)} clips, {self.bytes / 1048576:.1f} MB | {rate:.0f}% hit"
+
+audio_cache = AudioCache()
+
+def clean_speech_text(text):
+    return re.sub(r'[*#_`\[\]]', '', text).strip()
+
+# --- AUDIO POST-PROCESSING ---
+# KittenTTS outputs 24 kHz. For the usual 48 kHz device we upsample 2x with a
+# fixed polyphase FIR (upfirdn, O(n * taps)) instead of an FFT resample of the
+# whole clip, trim the filter delay, then peak normalize the result in place.
+# Each clip gets its own output array since clips are kept in the TTS cache.
+# With audio_native_24k the stream is opened at 24 kHz and the resampler is
+# skipped.
+class AudioPost:
+    TAPS = 47
+
+    def __init__(self):
+        self.h = (sp_signal.firwin(self.TAPS, 0.5) * 2).astype(np.float32)
+        self.delay = (self.TAPS - 1) // 2
+
+    def process(self, audio, rate=48000):
+        n = len(audio)
+        if rate == 24000:
+            out = np.array(audio, dtype=np.float32)
+        else:
+            # upfirdn allocates the output; the input only needs to be float32
+            out = sp_signal.upfirdn(self.h, np.asarray(audio, dtype=np.float32), up=2)[self.delay:self.delay + 2 * n]
+        peak = max(float(out.max()), -float(out.min())) if n else 0.0
+        if peak > 0: np.multiply(out, 0.9 / peak, out=out)
+        return out
+
+audio_post = None
+
+def output_rate():
+    return 24000 if config.get("audio_native_24k", False) else 48000
+
+def synthesize(text, voice=None):
+    global audio_post
+    voice = voice or config.get("tts_voice", "expr-voice-2-f")
+    rate = output_rate()
+    key = (voice, rate, " ".join(text.lower().split()))
+    clip = audio_cache.get(key)
+    if clip is not None: return clip
     
-    def _speak_thread():
+    if audio_post is None: audio_post = AudioPost()
+    t0 = time.perf_counter()
+    clip = audio_post.process(tts_model.generate(text, voice=voice), rate)
+    metrics.observe("tts", time.perf_counter() - t0)
+    audio_cache.put(key, clip)
+    return clip
+
+def iter_speech(text, parts=None):
+    # Yields the clip piece by piece (fragments, or sentences of free text)
+    # so playback can start on the first piece while the rest is synthesized
+    if not config.get("tts_compose_fragments", True):
+        yield synthesize(text)
+        return
+    if not parts: parts = re.split(r'(?<=[.!?])\s+', text)
+    gap = np.zeros(int(output_rate() * FRAGMENT_GAP), dtype=np.float32)
+    first = True
+    for part in parts:
+        part = clean_speech_text(part)
+        if not part: continue
+        if not first: yield gap
+        first = False
+        yield synthesize(part)
+
+def render_speech(text, parts=None):
+    pieces = list(iter_speech(text, parts))
+    return np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+
+def benchmark_audio_post(repeats=20):
+    # python main.py --bench-audio : old FFT resample path vs AudioPost
+    def legacy(audio_24k):
+        audio_48k = sp_signal.resample(audio_24k, len(audio_24k) * 2)
+        max_val = np.max(np.abs(audio_48k))
+        if max_val > 0: audio_48k = audio_48k / max_val * 0.9
+        return audio_48k.astype(np.float32)
+
+    post = AudioPost()
+    rng = np.random.default_rng(0)
+    print(f"{'clip':>8} {'legacy ms':>10} {'polyphase ms':>13} {'native24k ms':>13} {'speedup':>8}")
+    for seconds in (0.5, 1.5, 4.0, 10.0):
+        # Odd lengths like real TTS output, which are the slow case for FFTs
+        n = int(24000 * seconds) + 7
+        clip = sp_signal.lfilter([1.0], [1.0, -0.95], rng.standard_normal(n)).astype(np.float32)
+        timings = []
+        for fn in (legacy, lambda a: post.process(a, 48000), lambda a: post.process(a, 24000)):
+            fn(clip)
+            t0 = time.perf_counter()
+            for _ in range(repeats): fn(clip)
+            timings.append((time.perf_counter() - t0) * 1000 / repeats)
+        print(f"{seconds:>7.1f}s {timings[0]:>10.2f} {timings[1]:>13.2f} {timings[2]:>13.2f} {timings[0] / timings[1]:>7.1f}x")
+
+def prerender_phrases(voice=None):
+    if tts_model is None: return
+    t0 = time.time()
+    for phrase in STATIC_PHRASES:
+        try: synthesize(phrase, voice)
+        except Exception as e: print(f"Prerender Error: {e}")
+    log(f"Pre-rendered {len(STATIC_PHRASES)} phrases in {time.time() - t0:.1f}s.")
+
+# --- PLAYBACK SCHEDULER ---
+# One synthesis thread and one playback thread share a single persistent
+# output stream. Messages are ordered by priority (death events before
+# proximity ones, same scale as LOOKUP_PRIORITY); a higher-priority message
+# cuts off whatever lower-priority clip is playing. Identical pending messages
+# are coalesced, messages older than tts_max_age are dropped, and the backlog
+# is capped at tts_max_backlog. The next clip is synthesized while the
+# current one plays.
+PLAYBACK_CHUNK = 0.05  # seconds per stream write; granularity of preemption
+
+class SpeechScheduler:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = []   # heap: (prio, seq, created, text, parts)
+        self.ready = []     # heap: (prio, seq, created, text, chunk queue)
+        self.seq = itertools.count()
+        self.playing_prio = None
+        self.preempt = threading.Event()
+        self.stream = None
+        self.stream_device = None
+        self.started = False
+        self.played = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.preempted = 0
+
+    def start(self):
+        with self.cond:
+            if self.started: return
+            self.started = True
+        threading.Thread(target=self._synth_loop, daemon=True).start()
+        threading.Thread(target=self._play_loop, daemon=True).start()
+
+    def submit(self, text, parts=None, priority="Proximity"):
+        prio = LOOKUP_PRIORITY.get(priority, 1)
+        self.start()
+        with self.cond:
+            if any(item[3] == text for item in self.pending + self.ready):
+                self.coalesced += 1
+                return
+            heapq.heappush(self.pending, (prio, next(self.seq), time.time(), text, parts))
+            self._trim()
+            if self.playing_prio is not None and prio < self.playing_prio:
+                self.preempt.set()
+            self.cond.notify_all()
+
+    def _trim(self):
+        # Drop the least important, oldest messages beyond the backlog cap
+        limit = max(1, config.get("tts_max_backlog", 4))
+        while len(self.pending) + len(self.ready) > limit:
+            victims = self.pending + self.ready
+            worst = max(victims, key=lambda item: (item[0], -item[1]))
+            target = self.pending if worst in self.pending else self.ready
+            target.remove(worst)
+            heapq.heapify(target)
+            self.dropped += 1
+
+    def _pop_fresh(self, heap):
+        # Caller holds self.cond
+        max_age = config.get("tts_max_age", 20)
+        while heap:
+            item = heapq.heappop(heap)
+            if time.time() - item[2] <= max_age: return item
+            self.dropped += 1
+        return None
+
+    def _synth_loop(self):
+        while True:
+            with self.cond:
+                item = self._pop_fresh(self.pending)
+                while item is None:
+                    self.cond.wait()
+                    item = self._pop_fresh(self.pending)
+            prio, seq, created, text, parts = item
+            # Hand the message to playback right away and stream pieces into it
+            chunks = queue.Queue()
+            with self.cond:
+                heapq.heappush(self.ready, (prio, seq, created, text, chunks))
+                self.cond.notify_all()
+            try:
+                for clip in iter_speech(text, parts):
+                    chunks.put(clip)
+            except Exception as e:
+                print(f"Audio Error: {e}")
+            chunks.put(None)
+
+    def _open_stream(self):
+        target = (config.get("audio_device", 0), output_rate())
+        if self.stream is not None and self.stream_device == target: return
+        self._close_stream()
+        self.stream = sd.OutputStream(samplerate=target[1], channels=1, dtype="float32", device=target[0], latency=0.3)
+        self.stream.start()
+        self.stream_device = target
+
+    def _close_stream(self):
+        if self.stream is None: return
         try:
-            if tts_model:
-                selected_voice = config.get("tts_voice", "expr-voice-2-f")
-                audio_24k = tts_model.generate(text, voice=selected_voice)
-                
-                target_rate = 48000
-                samples = round(len(audio_24k) * float(target_rate) / 24000)
-                audio_48k = scipy.signal.resample(audio_24k, samples)
-                
-                max_val = np.max(np.abs(audio_48k))
-                if max_val > 0: audio_48k = audio_48k / max_val * 0.9 
-                
-                dev_idx = config.get("audio_device", 0)
-                sd.play(audio_48k.astype(np.float32), target_rate, device=dev_idx, blocking=True, latency=0.3)
-        except Exception as e:
-            print(f"Audio Error: {e}")
+            self.stream.stop()
+            self.stream.close()
+        except: pass
+        self.stream = None
 
-    threading.Thread(target=_speak_thread, daemon=True).start()
+    def _play_loop(self):
+        while True:
+            with self.cond:
+                item = self._pop_fresh(self.ready)
+                while item is None:
+                    self.cond.wait()
+                    item = self._pop_fresh(self.ready)
+                self.playing_prio = item[0]
+                self.preempt.clear()
+            chunks = item[4]
+            try:
+                self._open_stream()
+                step = int(self.stream_device[1] * PLAYBACK_CHUNK)
+                first = True
+                while not self.preempt.is_set():
+                    try: clip = chunks.get(timeout=PLAYBACK_CHUNK)
+                    except queue.Empty: continue
+                    if clip is None: break
+                    if first:
+                        # Time from speak() to the first sample going out
+                        metrics.observe("playback", time.time() - item[2])
+                        first = False
+                    for start in range(0, len(clip), step):
+                        if self.preempt.is_set(): break
+                        self.stream.write(clip[start:start + step].reshape(-1, 1))
+                if self.preempt.is_set(): self.preempted += 1
+                else: self.played += 1
+                metrics.inc("speech_items")
+            except Exception as e:
+                print(f"Audio Error: {e}")
+                self._close_stream()
+            with self.cond:
+                self.playing_prio = None
+
+    def summary(self):
+        with self.cond:
+            backlog = len(self.pending) + len(self.ready)
+        return f"Speech: {backlog} waiting | played {self.played} | preempted {self.preempted} | coalesced {self.coalesced} | dropped {self.dropped}"
+
+speech_scheduler = SpeechScheduler()
+
+def speak(text, parts=None, priority="Proximity"):
+    # parts: optional list of fragments that make up text, so fixed pieces
+    # come from the cache and only the variable bits are synthesized
+    if not text: return
+    text = clean_speech_text(text)
+    log(f"VOICE: {text}")
+    if tts_model and audio_enabled: speech_scheduler.submit(text, parts, priority)
 
 def sanitize_website_content(text):
     garbage_phrases = [
@@ -207,106 +1289,542 @@ def sanitize_website_content(text):
         text = text.replace(phrase, "")
     return text
 
-def check_bounty(player_name, context="Proximity"):
-    log(f"Searching: {player_name}...")
-    url = "https://speranzabounties.com/"
+# --- BROWSER SERVICE ---
+# Long-lived Chromium owned by a queue worker. Playwright's sync API is bound to
+# the thread that started it, so every worker keeps its own service. Pages sit
+# in a small pool already loaded on the search page; after a lookup a page is
+# sent back to the search page without waiting (the next lookup uses another
+# warm page meanwhile) and is replaced entirely after page_max_uses lookups.
+# If the browser dies it is relaunched on the next acquire.
+
+POPUP_NUKE_JS = """
+    document.querySelectorAll('div[class*="fixed"], div[class*="absolute"], div[class*="overlay"]').forEach(e => {
+        if (e.innerText.includes('Discord') || e.innerText.includes('Join')) {
+            e.remove();
+        }
+    });
+"""
+
+SEARCH_BOX = '[placeholder="SEARCH TARGETS..."]'
+
+# Resolves once the search has rendered something: either the empty-result
+# marker or a block of text mentioning the searched name. Evaluated on every
+# DOM mutation, so there is no fixed sleep anywhere in the lookup.
+RESULTS_READY_JS = """
+    name => {
+        const text = document.body.innerText.toUpperCase();
+        return text.includes('NO TARGETS FOUND') || text.includes(name.toUpperCase());
+    }
+"""
+
+# Pulls just the result cards out of the DOM: name, tag chips and any
+# free-form description. Selectors come from config so a site redesign only
+# needs a config edit.
+EXTRACT_RESULTS_JS = """
+    sel => {
+        const text = el => (el && el.innerText || "").trim();
+        const cards = Array.from(document.querySelectorAll(sel.card)).map(card => ({
+            name: text(card.querySelector(sel.name)),
+            tags: Array.from(card.querySelectorAll(sel.tag)).map(text).filter(Boolean),
+            text: Array.from(card.querySelectorAll(sel.text)).map(text).filter(Boolean).join(" ")
+        }));
+        return {cards: cards, none: document.body.innerText.toUpperCase().includes('NO TARGETS FOUND')};
+    }
+"""
+
+KNOWN_BOUNTY_TAGS = ["Voice Chat Snake", "Extraction Camper", "Friendly Fire"]
+
+def result_selectors():
+    return {key: config.get(f"result_{key}_selector", DEFAULT_CONFIG[f"result_{key}_selector"]) for key in ("card", "name", "tag", "text")}
+
+def pick_cards(player_name, cards):
+    # Only the card for this exact player; near matches are other players and
+    # their tags must never be read as this player's
+    wanted = canonical_name(player_name)
+    return [card for card in cards if canonical_name(card.get("name", "")) == wanted]
+
+def classify_cards(player_name, cards):
+    # Returns (status, details) when the tags settle it, else None
+    tags = []
+    for card in cards:
+        for tag in card.get("tags", []):
+            known = next((k for k in KNOWN_BOUNTY_TAGS if k.upper() == tag.upper()), tag)
+            if known not in tags: tags.append(known)
+    if tags: return "Bounty", f"{player_name} is listed for {', '.join(tags)}."
+    if not any(card.get("text") for card in cards): return "Clean", "No Tags"
+    return None
+
+def _ms_left(deadline):
+    return max(1, int((deadline - time.perf_counter()) * 1000))
+
+class BrowserService:
+    def __init__(self, url=None, pool_size=None, max_uses=None):
+        self.url = url or config.get("bounty_url", DEFAULT_CONFIG["bounty_url"])
+        self.pool_size = max(1, pool_size or config.get("browser_pages", 2))
+        self.max_uses = max(1, max_uses or config.get("page_max_uses", 25))
+        self.pw = None
+        self.browser = None
+        self.context = None
+        self.idle = []  # [page, uses]
+        self.restarts = 0
+
+    def start(self):
+        if self.pw is None:
+            self.pw = sync_playwright().start()
+        self.browser = self.pw.chromium.launch(headless=True)
+        self.context = self.browser.new_context()
+        self.context.set_default_timeout(config.get("lookup_deadline", 10) * 1000)
+        # Allow images briefly so layout doesn't break, but block media
+        self.context.route("**/*.{mp4,mp3}", lambda route: route.abort())
+        self.idle = []
+        for _ in range(self.pool_size):
+            self.idle.append([self._new_page(), 0])
+
+    def stop(self):
+        try:
+            if self.browser: self.browser.close()
+        except: pass
+        try:
+            if self.pw: self.pw.stop()
+        except: pass
+        self.browser = None
+        self.context = None
+        self.pw = None
+        self.idle = []
+
+    def alive(self):
+        try: return self.browser is not None and self.browser.is_connected()
+        except: return False
+
+    def _new_page(self, timeout=None):
+        page = self.context.new_page()
+        page.goto(self.url, wait_until="commit", timeout=timeout)
+        return page
+
+    def _recover(self):
+        if self.browser is not None:
+            self.restarts += 1
+            log(f"Browser lost, relaunching (restart #{self.restarts})...")
+        try:
+            if self.browser: self.browser.close()
+        except: pass
+        self.browser = None
+        self.start()
+
+    def acquire(self, deadline=None):
+        # deadline: the caller's perf_counter lookup deadline (None: context default)
+        left = lambda: _ms_left(deadline) if deadline else None
+        if not self.alive():
+            self._recover()
+        while self.idle:
+            slot = self.idle.pop(0)
+            page = slot[0]
+            try:
+                if page.is_closed(): continue
+                page.wait_for_load_state("domcontentloaded", timeout=left())
+                page.evaluate(POPUP_NUKE_JS)
+                return slot
+            except Exception:
+                try: page.close()
+                except: pass
+        page = self._new_page(left())
+        page.wait_for_load_state("domcontentloaded", timeout=left())
+        page.evaluate(POPUP_NUKE_JS)
+        return [page, 0]
+
+    def release(self, slot, ok=True):
+        page, uses = slot
+        uses += 1
+        try:
+            if not ok or uses >= self.max_uses or page.is_closed():
+                try: page.close()
+                except: pass
+                if self.alive():
+                    self.idle.append([self._new_page(), 0])
+            else:
+                # Wait until the fresh document has committed, so acquire()'s
+                # load-state wait can't be satisfied by the old results page
+                page.goto(self.url, wait_until="commit")
+                self.idle.append([page, uses])
+        except Exception as e:
+            print(f"Browser Recycle Warning: {e}")
+            try: page.close()
+            except: pass
+
+# --- SUMMARY SERVICE ---
+# One long-lived Gemini client shared by all lookup workers. Requests that
+# arrive within gemini_batch_window of each other are folded into a single
+# JSON request (up to gemini_batch_max players), and at most
+# gemini_concurrency requests are in flight. Callers block on their own
+# result with a gemini_timeout deadline; players missing from a batch answer
+# are retried one by one with the plain-text prompt.
+def build_summary_prompt(player_name, content):
+    return f"""
+    You are a tactical AI for Arc Raiders.
+    User searched for: '{player_name}'.
+    Raw Website Data: "{content}"
+    
+    INSTRUCTIONS:
+    1. IGNORE the slogan "Track Vote Eliminate" and "Join Discord".
+    2. Look for SPECIFIC bounty tags (e.g. "Voice Chat Snake", "Extraction Camper").
+    3. If you see NO specific tags/stats for this player, reply: "Clean".
+    4. If there are tags, summarize them in 10 words.
+    5. Start the sentence with "{player_name} is listed for...".
+    6. Plain Text Only.
+    """
+
+def build_batch_prompt(jobs):
+    sections = "\n".join(f"### PLAYER: {name}\n{content}\n" for name, content in jobs)
+    return f"""
+    You are a tactical AI for Arc Raiders. Below is the raw website data for
+    several searched players, each section headed by the player's name.
+    
+    INSTRUCTIONS:
+    1. IGNORE the slogan "Track Vote Eliminate" and "Join Discord".
+    2. Look for SPECIFIC bounty tags (e.g. "Voice Chat Snake", "Extraction Camper").
+    3. For a player with NO specific tags/stats, the answer is "Clean".
+    4. Otherwise summarize the tags in 10 words, starting with "<name> is listed for...".
+    5. Reply with ONLY a JSON object mapping each player name to its answer.
+    
+    {sections}
+    """
+
+class SummaryService:
+    def __init__(self, client_factory=None):
+        self.client_factory = client_factory
+        self.client = None
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.pending = []   # [name, content, Future]
+        self.pool = None
+        self.dispatcher = None
+        self.calls = 0
+        self.batched = 0
+        self.fallbacks = 0
+
+    def available(self):
+        return self.client_factory is not None or bool(GEMINI_KEY)
+
+    def _client(self):
+        with self.lock:
+            if self.client is None:
+                if self.client_factory: self.client = self.client_factory()
+                else:
+                    timeout_ms = int(config.get("gemini_timeout", 15) * 1000)
+                    self.client = genai.Client(api_key=GEMINI_KEY, http_options={"timeout": timeout_ms})
+            return self.client
+
+    def _start(self):
+        # Caller holds self.lock
+        if self.dispatcher is not None: return
+        self.pool = ThreadPoolExecutor(max_workers=max(1, config.get("gemini_concurrency", 2)), thread_name_prefix="gemini")
+        self.dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.dispatcher.start()
+
+    def summarize(self, player_name, content, timeout=None):
+        future = Future()
+        with self.cond:
+            self._start()
+            self.pending.append((player_name, content, future))
+            self.cond.notify()
+        return future.result(timeout=timeout or config.get("gemini_timeout", 15))
+
+    def _dispatch_loop(self):
+        while True:
+            with self.cond:
+                while not self.pending: self.cond.wait()
+                # Give other workers a moment to add their players to this batch
+                window_end = time.monotonic() + config.get("gemini_batch_window", 0.4)
+                limit = max(1, config.get("gemini_batch_max", 4))
+                while len(self.pending) < limit:
+                    left = window_end - time.monotonic()
+                    if left <= 0: break
+                    self.cond.wait(left)
+                batch, self.pending = self.pending[:limit], self.pending[limit:]
+            self.pool.submit(self._run_batch, batch)
+
+    def _generate(self, prompt, json_mode=False):
+        self.calls += 1
+        kwargs = {"config": {"response_mime_type": "application/json"}} if json_mode else {}
+        t0 = time.perf_counter()
+        try: return self._client().models.generate_content(model=config.get("gemini_model", "gemini-2.5-flash"), contents=prompt, **kwargs).text.strip()
+        finally: metrics.observe("gemini", time.perf_counter() - t0)
+
+    def _run_single(self, name, content, future):
+        try: future.set_result(self._generate(build_summary_prompt(name, content)))
+        except Exception as e: future.set_exception(e)
+
+    def _run_batch(self, batch):
+        if len(batch) == 1:
+            self._run_single(*batch[0])
+            return
+        answers = {}
+        try:
+            raw = self._generate(build_batch_prompt([(n, c) for n, c, _ in batch]), json_mode=True)
+            raw = raw.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+            answers = {str(k).strip().upper(): str(v) for k, v in json.loads(raw).items()}
+            self.batched += len(batch)
+        except Exception as e:
+            print(f"Gemini Batch Error: {e}")
+        for name, content, future in batch:
+            answer = answers.get(name.upper())
+            if answer:
+                future.set_result(answer.strip())
+            else:
+                self.fallbacks += 1
+                self._run_single(name, content, future)
+
+    def summary(self):
+        return f"Gemini: {self.calls} calls | {self.batched} players batched | {self.fallbacks} fallbacks"
+
+class FakeGeminiClient:
+    # Offline stand-in with the same generate_content surface as genai.Client.
+    # Answers from the tags it can see in the prompt, so lookups against
+    # standin/index.html can run end to end without an API key.
+    def __init__(self, delay=0.3):
+        self.delay = delay
+        self.models = self
+        self.prompts = []
+
+    def _verdict(self, name, text):
+        tags = [t for t in KNOWN_BOUNTY_TAGS if t.upper() in text.upper()]
+        return f"{name} is listed for {', '.join(tags)}." if tags else "Clean"
+
+    def generate_content(self, model=None, contents="", config=None):
+        self.prompts.append(contents)
+        time.sleep(self.delay)
+        if "### PLAYER:" in contents:
+            answers = {}
+            for section in contents.split("### PLAYER:")[1:]:
+                name, _, body = section.partition("\n")
+                answers[name.strip()] = self._verdict(name.strip(), body)
+            text = json.dumps(answers)
+        else:
+            name = re.search(r"User searched for: '([^']*)'", contents)
+            data = re.search(r'Raw Website Data: "(.*?)"\n', contents, re.S)
+            text = self._verdict(name.group(1) if name else "Player", data.group(1) if data else "")
+        return type("FakeResponse", (), {"text": text})()
+
+summarizer = SummaryService()
+verdict_sources = Counter()  # none / tags / gemini
+
+PAGE_NAME_SLOT = "{player}"   # stands in for the player's name in cached page verdicts
+
+def check_bounty(player_name, context, browser):
+    log(f"Searching: {player_name}...{metrics.tag(player_name)}")
+    metrics.inc("lookups")
+    slot = None
+    ok = True
     
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            context_browser = browser.new_context()
-            page = context_browser.new_page()
-            
-            # Allow images briefly so layout doesn't break, but block media
-            page.route("**/*.{mp4,mp3}", lambda route: route.abort())
-            
-            page.goto(url)
-            
-            try:
-                # NUKE POPUPS
-                page.evaluate("""
-                    document.querySelectorAll('div[class*="fixed"], div[class*="absolute"], div[class*="overlay"]').forEach(e => {
-                        if (e.innerText.includes('Discord') || e.innerText.includes('Join')) {
-                            e.remove();
-                        }
-                    });
-                """)
-                
-                page.wait_for_timeout(1000)
-                page.click('[placeholder="SEARCH TARGETS..."]', timeout=3000)
-                page.keyboard.type(player_name, delay=50) 
-                page.wait_for_timeout(200)
-                page.keyboard.press('Enter')
-                page.wait_for_timeout(3500)
-                
-            except Exception as e:
-                print(f"Interaction Warning: {e}")
-            
-            raw_content = page.inner_text("body")
-            clean_content = sanitize_website_content(raw_content)
+        t_start = time.perf_counter()
+        deadline = t_start + config.get("lookup_deadline", 10)
+        slot = browser.acquire(deadline)
+        page = slot[0]
+        t_nav = time.perf_counter()
+        t_input = t_nav
+        
+        try:
+            search_box = page.locator(SEARCH_BOX)
+            search_box.fill(player_name, timeout=_ms_left(deadline))
+            search_box.press('Enter', timeout=_ms_left(deadline))
+            t_input = time.perf_counter()
+            # Returns as soon as the results or the "no targets" marker render
+            page.wait_for_function(RESULTS_READY_JS, arg=player_name, polling="mutation", timeout=_ms_left(deadline))
             
-            browser.close()
+        except Exception as e:
+            print(f"Interaction Warning: {e}")
+        
+        t_done = time.perf_counter()
+        metrics.observe("browser", t_done - t_start)
+        log(f"Timing {player_name}: navigate {(t_nav - t_start) * 1000:.0f}ms | input {(t_input - t_nav) * 1000:.0f}ms | results {(t_done - t_input) * 1000:.0f}ms")
+        result = page.evaluate(EXTRACT_RESULTS_JS, result_selectors())
+        cards = pick_cards(player_name, result["cards"])
+        # Cards rendered, just none of them for this player: not listed
+        if result["cards"] and not cards: result["none"] = True
+        if cards:
+            clean_content = "\n".join(card["text"] for card in cards if card.get("text"))
+        else:
+            # Page layout not recognized: fall back to the whole page text
+            clean_content = sanitize_website_content(page.inner_text("body"))
+    except Exception as e:
+        ok = False
+        log(f"Web Error: {e}")
+        return
+    finally:
+        if slot: browser.release(slot, ok)
 
-            if "NO TARGETS FOUND" in raw_content:
-                log(f"Result: {player_name} is Clean.")
-                update_player_data(player_name, "Clean", "No Record")
-                speak(f"Raider {player_name} is not listed.")
-            else:
-                if GEMINI_KEY:
-                    client = genai.Client(api_key=GEMINI_KEY)
-                    
-                    prompt = f"""
-                    You are a tactical AI for Arc Raiders.
-                    User searched for: '{player_name}'.
-                    Raw Website Data: "{clean_content}"
-                    
-                    INSTRUCTIONS:
-                    1. IGNORE the slogan "Track Vote Eliminate" and "Join Discord".
-                    2. Look for SPECIFIC bounty tags (e.g. "Voice Chat Snake", "Extraction Camper").
-                    3. If you see NO specific tags/stats for this player, reply: "Clean".
-                    4. If there are tags, summarize them in 10 words.
-                    5. Start the sentence with "{player_name} is listed for...".
-                    6. Plain Text Only.
-                    """
+    try:
+        local = classify_cards(player_name, cards) if cards else None
+        if result["none"] and not cards:
+            log(f"Result: {player_name} is Clean.")
+            verdict_sources["none"] += 1
+            lookup_cache.put(player_name, "Clean", "No Record")
+            announce_result(player_name, "Clean", "No Record", context)
+        elif local:
+            log(f"Result: {player_name} is {local[0]} (tags).")
+            verdict_sources["tags"] += 1
+            lookup_cache.put(player_name, *local)
+            announce_result(player_name, *local, context)
+        else:
+            # Card text alone carries no name, so the player is part of the key
+            content_hash = hashlib.sha1((canonical_name(player_name) + "\n" + clean_content).encode("utf-8")).hexdigest()
+            cached = lookup_cache.get_page(content_hash)
+            if cached:
+                log(f"Cache hit: page for {player_name} unchanged.")
+                details = cached["details"].replace(PAGE_NAME_SLOT, player_name)
+                lookup_cache.put(player_name, cached["status"], details)
+                announce_result(player_name, cached["status"], details, context)
+            elif summarizer.available():
+                verdict_sources["gemini"] += 1
+                try:
+                    response = summarizer.summarize(player_name, clean_content)
                     
-                    try:
-                        response = client.models.generate_content(model="gemini-2.5-flash", contents=prompt).text.strip()
-                        
-                        if "Clean" in response or "clean" in response:
-                            update_player_data(player_name, "Clean", "Verified Clean")
-                            speak(f"Raider {player_name} is not listed.")
-                        else:
-                            update_player_data(player_name, "Bounty", response)
-                            speak(response)
-                    except: 
-                        update_player_data(player_name, "Bounty", "Manual Check Required")
-                        speak(f"Warning. Bounty data found for {player_name}")
-                else:
-                    update_player_data(player_name, "Bounty", "No API Key")
-                    speak(f"Warning. {player_name} has a record.")
+                    if "Clean" in response or "clean" in response:
+                        status, details = "Clean", "Verified Clean"
+                    else:
+                        status, details = "Bounty", response
+                    lookup_cache.put(player_name, status, details)
+                    # The page entry keeps a slot where the name was
+                    lookup_cache.put_page(content_hash, status, re.sub(re.escape(player_name), PAGE_NAME_SLOT, details, flags=re.IGNORECASE))
+                    announce_result(player_name, status, details, context)
+                except: 
+                    update_player_data(player_name, "Bounty", "Manual Check Required")
+                    speak(f"Warning. Bounty data found for {player_name}", ["Warning. Bounty data found for", player_name], context)
+            else:
+                update_player_data(player_name, "Bounty", "No API Key")
+                speak(f"Warning. {player_name} has a record.", ["Warning.", player_name, "has a record."], context)
 
     except Exception as e: log(f"Web Error: {e}")
 
 # --- 3. VISION ---
 
+# All intermediates for one capture region live in arrays sized once from the
+# region geometry, so the loop doesn't allocate per frame. The returned binary
+# image is one of those buffers and is overwritten by the next run().
+#
+# "fast" mode crops the icon off first, converts straight from BGRA to gray
+# and only then resizes the single gray channel. The scale is calibrated per
+# region so rows come out near ocr_text_height pixels tall (clamped to
+# ocr_scale_min..max) instead of a flat 3x. It is measured only inside the
+# boxes of a frame whose OCR read confident text (for death regions, an
+# actual death screen), so scenery never sets it; until then the region runs
+# at 2x. threshold_mode picks fixed levels, Otsu or adaptive thresholding.
+# "legacy" keeps the original 3x cubic upscale of the whole colour region.
+preprocess_scales = {}   # region -> scale of its latest binary, for the row finder
+
+class Preprocessor:
+    def __init__(self, shape, is_prox=True, region=None, options=None):
+        # options: per-region overrides (a profile region spec)
+        opts = options or {}
+        setting = lambda key, default: opts.get(key, config.get(key, default))
+        h, w = shape[:2]
+        channels = shape[2] if len(shape) > 2 else 3
+        self.shape = (h, w)
+        self.is_prox = is_prox
+        self.region = region or ("prox" if is_prox else "death")
+        self.mode = setting("preprocess_mode", "fast")
+        self.threshold_mode = setting("threshold_mode", "fixed")
+        self.text_height = setting("ocr_text_height", 40)
+        icon_crop = int(setting("icon_crop", 65))
+        self.gray_code = cv2.COLOR_BGRA2GRAY if channels == 4 else cv2.COLOR_BGR2GRAY
+        if self.mode == "legacy":
+            self.scale = 3.0
+            self.calibrated = True
+            self.size = (w * 3, h * 3)
+            self.crop = min(icon_crop, w * 3 - 1) if is_prox else 0
+            self.resized = np.empty((h * 3, w * 3, channels), dtype=np.uint8)
+            self.gray = np.empty((h * 3, w * 3 - self.crop), dtype=np.uint8)
+            self.binary = np.empty_like(self.gray)
+        else:
+            # icon_crop is measured at the old 3x size
+            self.crop = min(int(round(icon_crop / 3)), w - 1) if is_prox else 0
+            self.gray_src = np.empty((h, w - self.crop), dtype=np.uint8)
+            self.calibrated = False
+            self._allocate(min(2.0, config.get("ocr_scale_max", 3.0)))
+        preprocess_scales[self.region] = self.scale
+
+    def _allocate(self, scale):
+        h, w = self.gray_src.shape
+        self.scale = scale
+        self.size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+        self.gray = np.empty((self.size[1], self.size[0]), dtype=np.uint8)
+        self.binary = np.empty_like(self.gray)
+        preprocess_scales[self.region] = scale
+
+    def calibrate(self, ocr_results):
+        # Call right after OCR of this preprocessor's latest frame (gray_src
+        # still holds it). Text is bright on both regions; measure it at 1x,
+        # only within the boxes OCR read with confidence.
+        if self.calibrated: return
+        lines = [line for line in ocr_results or [] if line[2] > 0.6]
+        if not lines: return
+        ink = (self.gray_src > (170 if self.is_prox else 127)).astype(np.uint8) * 255
+        pad = max(1, round(ROW_PAD / 3))
+        heights = []
+        for box, _, _ in lines:
+            xs = [p[0] / self.scale for p in box]
+            ys = [p[1] / self.scale for p in box]
+            crop = ink[max(0, int(min(ys))):int(np.ceil(max(ys))), max(0, int(min(xs))):int(np.ceil(max(xs)))]
+            if crop.size == 0: continue
+            heights += [y1 - y0 - 2 * pad for _, y0, _, y1 in find_row_bands(crop, 1.0)]
+        heights = [hgt for hgt in heights if hgt >= 4]
+        if not heights: return
+        text_h = float(np.median(heights))
+        scale = self.text_height / text_h
+        scale = min(max(scale, config.get("ocr_scale_min", 1.0)), config.get("ocr_scale_max", 3.0))
+        self.calibrated = True
+        if abs(scale - self.scale) > 0.05: self._allocate(round(scale, 2))
+        log(f"{self.region} text ~{text_h:.0f}px -> OCR scale {self.scale:.2f}")
+
+    def _threshold(self, gray, dst):
+        # Output is always dark-on-light for death (as the det model likes)
+        # and light-on-dark for proximity (what the row finder expects)
+        invert = cv2.THRESH_BINARY if self.is_prox else cv2.THRESH_BINARY_INV
+        if self.threshold_mode == "otsu":
+            cv2.threshold(gray, 0, 255, invert | cv2.THRESH_OTSU, dst=dst)
+        elif self.threshold_mode == "adaptive":
+            block = max(3, int(round(self.text_height * 1.5)) | 1)
+            cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, invert, block, -10, dst=dst)
+        else:
+            cv2.threshold(gray, 170 if self.is_prox else 127, 255, invert, dst=dst)
+
+    def run(self, img):
+        if self.mode == "legacy": return self._run_legacy(img)
+        # Crop the icon (proximity only) and go straight to one gray channel
+        cv2.cvtColor(img[:, self.crop:], self.gray_code, dst=self.gray_src)
+        if self.scale == 1.0: np.copyto(self.gray, self.gray_src)
+        else: cv2.resize(self.gray_src, self.size, dst=self.gray, interpolation=cv2.INTER_CUBIC)
+        self._threshold(self.gray, self.binary)
+        preprocess_scales[self.region] = self.scale
+        return self.binary
+
+    def _run_legacy(self, img):
+        # Resize for better OCR
+        cv2.resize(img, self.size, dst=self.resized, interpolation=cv2.INTER_CUBIC)
+        # Crop left icon (proximity only), then grayscale
+        cv2.cvtColor(self.resized[:, self.crop:], self.gray_code, dst=self.gray)
+        if self.is_prox:
+            cv2.threshold(self.gray, 170, 255, cv2.THRESH_BINARY, dst=self.binary)
+        else:
+            # Death screen: White text on Black BG -> Invert for OCR
+            cv2.bitwise_not(self.gray, dst=self.gray)
+            cv2.threshold(self.gray, 127, 255, cv2.THRESH_BINARY, dst=self.binary)
+        preprocess_scales[self.region] = self.scale
+        return self.binary
+
+def calibrate_preprocessors(preps, results):
+    # preps/results: region -> Preprocessor / OCR result of the same tick
+    for region, res in results.items():
+        prep = preps.get(region)
+        if prep is None or prep.calibrated or not res: continue
+        # Gameplay behind a death region must not set its scale
+        if region_parser(region) == "death" and not analyze_death_screen(res): continue
+        prep.calibrate(res)
+
 def preprocess_image(img, is_prox=True):
-    # Resize for better OCR
-    img = cv2.resize(img, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
-    
-    if is_prox:
-        crop_val = config.get('icon_crop', 65)
-        img = img[:, crop_val:] # Crop left icon
-        if img.shape[2] == 4: img = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
-        else: img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        _, binary = cv2.threshold(img, 170, 255, cv2.THRESH_BINARY)
-        return binary
-    else:
-        # Death screen: White text on Black BG -> Invert for OCR
-        if img.shape[2] == 4: img = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
-        else: img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        img = cv2.bitwise_not(img)
-        _, binary = cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)
-        return binary
+    # One-off version for callers outside the capture loop
+    return Preprocessor(img.shape, is_prox).run(img)
 
 def analyze_death_screen(ocr_results):
     killer_name = None
@@ -329,99 +1847,735 @@ def analyze_death_screen(ocr_results):
 
     return killer_name
 
+# --- CAPTURE SESSION ---
+# The mss handle is opened once per run instead of once per tick, and frames
+# are exposed as zero-copy numpy views over the grabbed BGRA bytes.
+class CaptureSession:
+    def __init__(self):
+        self.sct = mss.mss()
+
+    def grab(self, region):
+        shot = self.sct.grab(region)
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def absolute(self, rect):
+        # mss reads left/top as virtual-desktop coordinates and ignores "mon",
+        # so shift by the monitor's origin (same frame as the settings preview)
+        monitors = self.sct.monitors
+        mon = rect["mon"] if 0 < rect["mon"] < len(monitors) else 1
+        origin = monitors[mon]
+        return {"left": origin["left"] + rect["left"], "top": origin["top"] + rect["top"], "width": rect["width"], "height": rect["height"], "mon": mon}
+
+    def grab_all(self, rects):
+        # rects: name -> monitor-relative mss rect. Regions sharing a monitor
+        # come out of one grab of their bounding box as views, unless the box
+        # is mostly pixels nobody reads (combined_grab_max_ratio).
+        views = {}
+        by_monitor = {}
+        rects = {name: self.absolute(rect) for name, rect in rects.items()}
+        for name, rect in rects.items(): by_monitor.setdefault(rect["mon"], []).append(name)
+        for mon, names in by_monitor.items():
+            t0 = time.perf_counter()
+            left = min(rects[n]["left"] for n in names)
+            top = min(rects[n]["top"] for n in names)
+            right = max(rects[n]["left"] + rects[n]["width"] for n in names)
+            bottom = max(rects[n]["top"] + rects[n]["height"] for n in names)
+            used = sum(rects[n]["width"] * rects[n]["height"] for n in names)
+            if len(names) == 1 or (right - left) * (bottom - top) > used * config.get("combined_grab_max_ratio", 4.0):
+                for n in names: views[n] = self.grab(rects[n])
+            else:
+                frame = self.grab({"left": left, "top": top, "width": right - left, "height": bottom - top, "mon": mon})
+                for n in names:
+                    r = rects[n]
+                    views[n] = frame[r["top"] - top:r["top"] - top + r["height"], r["left"] - left:r["left"] - left + r["width"]]
+            track_stage(f"mon{mon}", "grab", time.perf_counter() - t0)
+        return views
+
+    def close(self):
+        try: self.sct.close()
+        except: pass
+
+geometry_version = 0  # bumped when a region moves or resizes or the profile changes
+GEOMETRY_KEYS = ["monitor_index", "prox_x", "prox_y", "prox_w", "prox_h", "death_x", "death_y", "death_w", "death_h", "icon_crop"]
+
+# --- CAPTURE PROFILES ---
+# config["profiles"] maps a profile name to {"regions": [...]}; the loop runs
+# config["active_profile"]. A region has a unique name, a parser ("chat" for
+# the proximity name list, "death" for the death screen, "custom" for free
+# text), a monitor and x/y/w/h relative to that monitor, and may override
+# interval, icon_crop, preprocess_mode, threshold_mode, ocr_text_height,
+# prox_ocr_mode, or set enabled: false. Configs from before profiles become a
+# "default" profile built from the prox_*/death_* keys; the stray roi_* box
+# some of them carry is kept as a disabled custom region. The prox/death
+# sliders in the settings edit the regions of the same name.
+REGION_PARSERS = ["chat", "death", "custom"]
+PARSER_PRIORITY = {"death": 0, "chat": 1, "custom": 2}   # handled in this order each tick
+PARSER_INTERVAL_KEYS = {"chat": "prox_interval", "death": "death_interval", "custom": "prox_interval"}
+REGION_OVERRIDES = ["interval", "preprocess_mode", "threshold_mode", "ocr_text_height", "prox_ocr_mode"]
+active_regions = {}   # name -> spec of the regions the loop is running
+
+def legacy_regions(cfg):
+    mon = cfg.get("monitor_index", 1)
+    regions = [
+        {"name": "prox", "parser": "chat", "monitor": mon, "x": cfg.get("prox_x", 0), "y": cfg.get("prox_y", 0),
+         "w": cfg.get("prox_w", 233), "h": cfg.get("prox_h", 152), "icon_crop": cfg.get("icon_crop", 65)},
+        {"name": "death", "parser": "death", "monitor": mon, "x": cfg.get("death_x", 0), "y": cfg.get("death_y", 0),
+         "w": cfg.get("death_w", 600), "h": cfg.get("death_h", 300)},
+    ]
+    if all(k in cfg for k in ("roi_left", "roi_top", "roi_width", "roi_height")):
+        regions.append({"name": "roi", "parser": "custom", "monitor": mon, "x": cfg["roi_left"], "y": cfg["roi_top"],
+                        "w": cfg["roi_width"], "h": cfg["roi_height"], "icon_crop": cfg.get("icon_crop_width", 0), "enabled": False})
+    return regions
+
+def migrate_profiles():
+    if not isinstance(config.get("profiles"), dict) or not config["profiles"]:
+        config["profiles"] = {"default": {"regions": legacy_regions(config)}}
+    if config.get("active_profile") not in config["profiles"]:
+        config["active_profile"] = next(iter(config["profiles"]))
+
+def sync_legacy_regions():
+    # Push the prox/death slider values into the active profile
+    for region in config["profiles"][config["active_profile"]].get("regions", []):
+        if region.get("name") in ("prox", "death"):
+            key = region["name"]
+            region.update(monitor=config.get("monitor_index", 1), x=config[f"{key}_x"], y=config[f"{key}_y"], w=config[f"{key}_w"], h=config[f"{key}_h"])
+            if key == "prox": region["icon_crop"] = config.get("icon_crop", 65)
+
+def check_region(i, region, names, monitors=None):
+    # Validates one region; raises ValueError. names: names taken by earlier
+    # regions. monitors: how many monitors exist, when known
+    if not isinstance(region, dict): raise ValueError(f"region {i + 1} is not an object")
+    name = str(region.get("name") or "")
+    if not name or name in names: raise ValueError(f"region {i + 1} needs a unique name")
+    if region.get("parser", "custom") not in REGION_PARSERS: raise ValueError(f"{name}: parser must be one of {', '.join(REGION_PARSERS)}")
+    try:
+        if int(region["w"]) <= 0 or int(region["h"]) <= 0: raise ValueError
+        int(region["x"]); int(region["y"])
+    except (KeyError, TypeError, ValueError): raise ValueError(f"{name}: x, y and positive w, h are required")
+    try: int(region.get("icon_crop", 0))
+    except (TypeError, ValueError): raise ValueError(f"{name}: icon_crop must be a number")
+    if "monitor" in region:
+        try: mon = int(region["monitor"])
+        except (TypeError, ValueError): mon = 0
+        # A disabled region may sit on a monitor that isn't plugged in right now
+        if not region.get("enabled", True): monitors = None
+        if mon < 1 or (monitors and mon > monitors):
+            raise ValueError(f"{name}: monitor must be " + (f"between 1 and {monitors}" if monitors else "1 or higher"))
+    return name
+
+def parse_regions(regions, monitors=None):
+    # Validates a whole region list (the profile editor); raises ValueError on the first bad one
+    if isinstance(regions, dict): regions = regions.get("regions")
+    if not isinstance(regions, list): raise ValueError("expected a list of regions")
+    names = set()
+    for i, region in enumerate(regions): names.add(check_region(i, region, names, monitors))
+    return regions
+
+def profile_regions(name=None, monitors=None):
+    # Enabled regions of a profile as normalized specs, name -> spec. A bad
+    # region is logged and skipped; the rest of the profile still runs.
+    profile = config.get("profiles", {}).get(name or config.get("active_profile")) or {}
+    regions = profile.get("regions", [])
+    if not isinstance(regions, list):
+        log("Profile Error: expected a list of regions")
+        return {}
+    specs = {}
+    names = set()
+    for i, region in enumerate(regions):
+        try: names.add(check_region(i, region, names, monitors))
+        except ValueError as e:
+            log(f"Profile Error: {e} (region skipped)")
+            continue
+        if not region.get("enabled", True): continue
+        parser = region.get("parser", "custom")
+        spec = {"name": region["name"], "parser": parser, "monitor": int(region.get("monitor", config.get("monitor_index", 1))),
+                "x": int(region["x"]), "y": int(region["y"]), "w": int(region["w"]), "h": int(region["h"]),
+                "icon_crop": int(region.get("icon_crop", config.get("icon_crop", 65) if parser == "chat" else 0))}
+        for key in REGION_OVERRIDES:
+            if key in region: spec[key] = region[key]
+        specs[spec["name"]] = spec
+    return specs
+
+def activate_regions(monitors=None):
+    global active_regions
+    active_regions = profile_regions(monitors=monitors)
+    return active_regions
+
+def region_parser(region):
+    spec = active_regions.get(region)
+    if spec: return spec["parser"]
+    return "death" if region == "death" else "chat"
+
+def capture_regions(specs):
+    return {name: {"top": spec["y"], "left": spec["x"], "width": spec["w"], "height": spec["h"], "mon": spec["monitor"]} for name, spec in specs.items()}
+
+def track_stage(region, stage, seconds):
+    metrics.observe(stage, seconds, region)
+
+# --- FRAME CHANGE GATE ---
+# Sits between the grab and OCR. Each region keeps a small thumbnail of the last
+# binarized frame that went through OCR; if the new frame looks the same we
+# reuse the previous OCR result instead of running the engine again.
+class FrameGate:
+    def __init__(self, name):
+        self.name = name
+        self.thumb = None
+        self.result = None
+        self.runs = 0    # frames that actually ran OCR
+        self.skips = 0   # frames that reused the last result
+        self.last_changed = False
+
+    def changed(self, binary):
+        h, w = binary.shape[:2]
+        thumb = cv2.resize(binary, (max(1, w // 4), max(1, h // 4)), interpolation=cv2.INTER_AREA)
+        if self.thumb is None or self.thumb.shape != thumb.shape:
+            self.thumb = thumb
+            return True
+        diff = cv2.absdiff(thumb, self.thumb)
+        if np.count_nonzero(diff > config.get("gate_delta", 24)) < config.get("gate_min_pixels", 3):
+            return False
+        self.thumb = thumb
+        return True
+
+    def run(self, binary, engine, region=None):
+        self.last_changed = self.changed(binary) or self.runs == 0
+        if self.last_changed:
+            t0 = time.perf_counter()
+            self.result, _ = engine(binary)
+            if region: track_stage(region, "ocr", time.perf_counter() - t0)
+            self.runs += 1
+        else:
+            self.skips += 1
+        return self.result
+
+    def reset(self):
+        self.thumb = None
+        self.result = None
+
+    def summary(self):
+        total = self.runs + self.skips
+        saved = (100.0 * self.skips / total) if total else 0.0
+        return f"{self.name}: OCR {self.runs} | skipped {self.skips} ({saved:.0f}% saved)"
+
+frame_gates = {"prox": FrameGate("Proximity"), "death": FrameGate("Death")}
+
+def gate_for(region):
+    gate = frame_gates.get(region)
+    if gate is None: gate = frame_gates[region] = FrameGate(region)
+    return gate
+
+# --- ROW RECOGNIZER ---
+# Fast path for the proximity chat panel, which is just a stack of name rows.
+# Rows are found with a horizontal projection profile of the binarized image
+# and each row crop goes straight to RapidOCR's recognizer, skipping the text
+# detector and angle classifier. Crops are cached by content, so rows that
+# didn't change since the last frame are not recognized again. The result has
+# the same [box, text, score] shape as a full ocr_engine() call.
+ROW_MIN_INK = 2       # pixels per scanline that count as text
+ROW_MIN_HEIGHT = 12   # bands thinner than this (at 3x) are noise
+ROW_GAP = 3           # blank scanlines tolerated inside one row (at 3x)
+ROW_PAD = 4           # (at 3x)
+
+def find_row_bands(binary, scale=3.0):
+    # The row constants are tuned at 3x; scale them to this binary
+    min_height = max(2, int(round(ROW_MIN_HEIGHT * scale / 3)))
+    gap = max(1, int(round(ROW_GAP * scale / 3)))
+    pad = max(1, int(round(ROW_PAD * scale / 3)))
+    ink = cv2.reduce(binary, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+    rows = np.flatnonzero(ink >= ROW_MIN_INK)
+    bands = []
+    if len(rows) == 0: return bands
+    # Split wherever the gap between inked scanlines is bigger than the gap
+    breaks = np.flatnonzero(np.diff(rows) > gap + 1)
+    starts = np.concatenate(([rows[0]], rows[breaks + 1]))
+    ends = np.concatenate((rows[breaks], [rows[-1]]))
+    h, w = binary.shape[:2]
+    for y0, y1 in zip(starts, ends):
+        if y1 - y0 + 1 < min_height: continue
+        cols = np.flatnonzero(cv2.reduce(binary[y0:y1 + 1], 0, cv2.REDUCE_MAX).ravel())
+        if len(cols) == 0: continue
+        bands.append((max(0, int(cols[0]) - pad), max(0, int(y0) - pad), min(w, int(cols[-1]) + 1 + pad), min(h, int(y1) + 1 + pad)))
+    return bands
+
+class RowCache:
+    def __init__(self, size=256):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.recognized = 0
+        self.reused = 0
+
+    def get(self, key):
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is not None:
+                self.entries.move_to_end(key)
+                self.reused += 1
+            return hit
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.recognized += 1
+            while len(self.entries) > self.size: self.entries.popitem(last=False)
+
+    def summary(self):
+        return f"Rows: recognized {self.recognized} | reused {self.reused}"
+
+row_cache = RowCache()
+
+def recognize_rows(engine, binary, scale=None):
+    results = []
+    todo = []
+    for (x0, y0, x1, y1) in find_row_bands(binary, scale or preprocess_scales.get("prox", 3.0)):
+        crop = binary[y0:y1, x0:x1]
+        key = hashlib.blake2b(np.ascontiguousarray(crop).data, digest_size=16).digest() + bytes(str(crop.shape), "ascii")
+        box = [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+        hit = row_cache.get(key)
+        if hit is not None:
+            results.append([box, hit[0], hit[1]])
+        else:
+            todo.append((key, box, cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR)))
+    if todo:
+        rec_res, _ = engine.text_rec([item[2] for item in todo])
+        for (key, box, _), (text, score) in zip(todo, rec_res):
+            row_cache.put(key, (text, float(score)))
+            results.append([box, text, float(score)])
+    results.sort(key=lambda r: r[0][0][1])
+    return results or None
+
+# --- OCR EXECUTOR ---
+# Every region that is due in a tick is OCR'd in parallel on a small thread
+# pool (onnxruntime releases the GIL during inference). RapidOCR instances are
+# not shared between threads: the first pool thread reuses the engine loaded
+# by init_engines, any other thread loads its own. Results are handed back as
+# each region finishes, so a death screen is handled without waiting for the
+# proximity OCR of the same tick.
+class OcrExecutor:
+    def __init__(self, workers=None):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers or config.get("ocr_workers", 2)), thread_name_prefix="ocr")
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.shared_taken = False
+        self.owned = []
+
+    def _engine(self):
+        engine = getattr(self.local, "engine", None)
+        if engine is None:
+            with self.lock:
+                if not self.shared_taken and ocr_engine is not None:
+                    engine = ocr_engine
+                    self.shared_taken = True
+                else:
+                    engine = spare_ocr_engines.pop() if spare_ocr_engines else RapidOCR()
+                    self.owned.append(engine)
+            self.local.engine = engine
+        return engine
+
+    def _run(self, region, binary):
+        engine = self._engine()
+        gate = gate_for(region)
+        spec = active_regions.get(region, {})
+        if region_parser(region) == "chat" and spec.get("prox_ocr_mode", config.get("prox_ocr_mode", "rows")) == "rows":
+            scale = preprocess_scales.get(region, 3.0)
+            return gate.run(binary, lambda img: (recognize_rows(engine, img, scale), None), region)
+        return gate.run(binary, engine, region)
+
+    def run_batch(self, jobs):
+        # jobs: region -> preprocessed image; yields (region, OCR result) in
+        # completion order. Submitted by parser priority so death gets a worker first.
+        order = sorted(jobs, key=lambda region: PARSER_PRIORITY[region_parser(region)])
+        futures = {self.pool.submit(self._run, region, jobs[region]): region for region in order}
+        for future in as_completed(futures):
+            # A failed region yields None so the batch always drains: the next
+            # tick must not reuse buffers an unfinished OCR is still reading
+            try: result = future.result()
+            except Exception as e:
+                print(f"OCR Error ({futures[future]}): {e}")
+                result = None
+            yield futures[future], result
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+        # Hand the extra engines back for the next session
+        spare_ocr_engines.extend(self.owned)
+
+# --- REGION SCHEDULER ---
+# Each region is scanned on its own interval on a monotonic clock instead of
+# the old modulo-on-wall-clock check. death_interval is the guaranteed
+# worst-case wait before a death screen gets looked at (plus one tick of OCR).
+# A region's own "interval" pins its cadence; otherwise it follows the
+# parser's interval key and the adaptive rate.
+class RegionScheduler:
+    def __init__(self, regions):
+        # regions: name -> spec
+        now = time.monotonic()
+        self.specs = dict(regions)
+        self.next_due = {region: now for region in regions}
+        self.max_lag = {region: 0.0 for region in regions}
+
+    def interval(self, region):
+        spec = self.specs.get(region, {})
+        parser = spec.get("parser", "chat")
+        key = PARSER_INTERVAL_KEYS[parser]
+        fixed = max(0.05, spec.get("interval") or config.get(key, DEFAULT_CONFIG[key]))
+        if not config.get("adaptive_capture", True): return fixed
+        # The death interval stays a hard ceiling so idling never delays it
+        if parser == "death": return min(fixed, capture_rate.period())
+        if "interval" in spec: return fixed
+        return capture_rate.period()
+
+    def expedite(self):
+        # Pull in regions scheduled at an idle-rate interval after a rate bump
+        now = time.monotonic()
+        for region in self.next_due:
+            self.next_due[region] = min(self.next_due[region], now + self.interval(region))
+
+    def due(self):
+        now = time.monotonic()
+        ready = [region for region, t in self.next_due.items() if now >= t]
+        for region in ready:
+            self.max_lag[region] = max(self.max_lag[region], now - self.next_due[region])
+            nxt = self.next_due[region] + self.interval(region)
+            # Don't try to catch up on ticks missed while OCR was busy
+            self.next_due[region] = nxt if nxt > now else now + self.interval(region)
+        return ready
+
+    def sleep_time(self):
+        if not self.next_due: return 0.25
+        return max(0.0, min(self.next_due.values()) - time.monotonic())
+
+    def summary(self):
+        return " | ".join(f"{region} every {self.interval(region):.2f}s (max lag {self.max_lag[region] * 1000:.0f}ms)" for region in self.next_due)
+
+region_scheduler = None
+
+# --- ADAPTIVE CAPTURE RATE ---
+# Jumps to capture_rate_max for burst_seconds after any detection or real
+# change on screen, then decays toward capture_rate_min while the regions
+# stay empty or unchanged (menus, alt-tab). Duty is the loop's measured busy
+# time per wall-clock second, every region included. While it exceeds
+# cpu_budget a throttle factor stretches the rate (down to capture_rate_min),
+# which slows the non-death regions; death regions never wait longer than
+# death_interval, so they can keep the loop above budget on their own.
+class AdaptiveRate:
+    DECAY = 0.85  # per tick once the burst window has passed
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.rate = self.target = config.get("capture_rate_max", 6.0)
+        self.burst_until = 0.0
+        self.duty = 0.0
+        self.state = "burst"
+        self.throttle = 1.0
+        self.busy = 0.0
+        self.window_start = time.monotonic()
+
+    def period(self):
+        return 1.0 / self.rate
+
+    def update(self, active, busy):
+        # Returns True when the rate jumped up, so the scheduler can react
+        now = time.monotonic()
+        lo = max(0.05, config.get("capture_rate_min", 0.5))
+        hi = max(lo, config.get("capture_rate_max", 6.0))
+        old = self.rate
+        if active: self.burst_until = now + config.get("burst_seconds", 5)
+        if now < self.burst_until:
+            self.target, self.state = hi, "burst"
+        else:
+            self.target = max(lo, self.target * self.DECAY)
+            self.state = "idle" if self.target <= lo else "cooling"
+        
+        # Re-evaluated about once a second so one slow tick doesn't slam the rate
+        self.busy += busy
+        elapsed = now - self.window_start
+        if elapsed >= 1.0:
+            self.duty = self.duty * 0.5 + min(1.0, self.busy / elapsed) * 0.5
+            self.busy = 0.0
+            self.window_start = now
+            if self.duty > 0:
+                budget = config.get("cpu_budget", 0.25)
+                self.throttle = min(1.0, self.throttle * min(2.0, max(0.5, budget / self.duty)))
+        rate = max(lo, min(self.target, hi * self.throttle))
+        if rate < self.target: self.state += ", cpu capped"
+        self.rate = rate
+        return rate > old * 1.5
+
+    def summary(self):
+        return f"Capture: {self.rate:.1f} Hz ({self.state}) | CPU {self.duty * 100:.0f}% of {config.get('cpu_budget', 0.25) * 100:.0f}% budget (death regions exempt)"
+
+capture_rate = AdaptiveRate()
+
+# --- NAME STABILIZER ---
+# A single frame with a confident misread used to be enough to queue a lookup.
+# Each region now keeps its reads from the last vote_frames frames, grouped by
+# canonical name; a name is only released once it showed up in vote_min_hits
+# of those frames, and the text released is a confidence-weighted per-character
+# vote over all the reads in its group. Names that drop out of the window
+# without ever being released count as suppressed.
+#
+# Only frames that changed and went through OCR are votes; a result the gate
+# reused is the same picture again. On a still screen waiting adds no
+# evidence, so a name read once is released as soon as the screen is seen
+# unchanged if that read had at least vote_still_conf confidence. Voting
+# therefore catches misreads that flicker between frames, but on a still
+# screen it only filters out low-confidence reads.
+class NameStabilizer:
+    def __init__(self, name):
+        self.name = name
+        self.frames = deque()   # per frame: canonical -> [(text, conf)]
+        self.released = set()   # canonicals already let through and still on screen
+        self.passed = 0
+        self.suppressed = 0
+
+    def reset(self):
+        self.frames.clear()
+        self.released = set()
+
+    def feed(self, reads, fresh=True):
+        # fresh: False when these reads are the frame gate's cached result
+        if not fresh: return self._still()
+        window = max(1, config.get("vote_frames", 3))
+        needed = min(window, max(1, config.get("vote_min_hits", 2)))
+        frame = {}
+        for text, conf in reads:
+            frame.setdefault(canonical_name(text), []).append((text, conf))
+        self.frames.append(frame)
+        while len(self.frames) > window:
+            for canon in self.frames.popleft():
+                if canon not in self.released and not any(canon in f for f in self.frames):
+                    self.suppressed += 1
+        
+        stable = []
+        for canon in frame:
+            if sum(1 for f in self.frames if canon in f) >= needed:
+                stable.append(self._vote(canon))
+                if canon not in self.released:
+                    self.released.add(canon)
+                    self.passed += 1
+        # Forget names that have left the screen so a comeback is voted again
+        self.released = {c for c in self.released if any(c in f for f in self.frames)}
+        return stable
+
+    def _still(self):
+        stable = []
+        if not self.frames: return stable
+        for canon, reads in self.frames[-1].items():
+            if canon in self.released or max(conf for _, conf in reads) < config.get("vote_still_conf", 0.9): continue
+            stable.append(self._vote(canon))
+            self.released.add(canon)
+            self.passed += 1
+        return stable
+
+    def _vote(self, canon):
+        reads = [r for f in self.frames for r in f.get(canon, [])]
+        length = Counter(len(t) for t, _ in reads).most_common(1)[0][0]
+        chars = []
+        for i in range(length):
+            votes = {}
+            for text, conf in reads:
+                if len(text) == length: votes[text[i]] = votes.get(text[i], 0) + conf
+            chars.append(max(votes, key=votes.get))
+        return ''.join(chars)
+
+    def summary(self):
+        return f"{self.name}: {self.passed} names passed | {self.suppressed} suppressed"
+
+stabilizers = {"prox": NameStabilizer("Proximity votes"), "death": NameStabilizer("Death votes")}
+
+def stabilizer_for(region):
+    stabilizer = stabilizers.get(region)
+    if stabilizer is None: stabilizer = stabilizers[region] = NameStabilizer(f"{region} votes")
+    return stabilizer
+
 # --- 4. BACKGROUND LOOP ---
 
+def read_prox_names(res_prox):
+    reads = []
+    for line in res_prox or []:
+        text, conf = line[1], line[2]
+        if conf > 0.6:
+            name = clean_name(text)
+            if len(name) > 3 and name not in ["DETECTED", "SEARCHING", "Intel"]:
+                reads.append((name, conf))
+    return reads
+
+def handle_proximity(res_prox, region="prox"):
+    # Returns True if anything new was announced or queued
+    active = False
+    reads = read_prox_names(res_prox)
+    
+    # Only names that held steady over the last few frames get through
+    for name in stabilizer_for(region).feed(reads, gate_for(region).last_changed):
+        name = name_index.resolve(name)
+        
+        # Re-encounter Logic
+        current_time = time.time()
+        needs_check = True
+        
+        info = players.get(name)
+        if info is not None:
+            last_time = info.get("time", 0)
+            if current_time - last_time < 1800: # 30 mins
+                needs_check = False
+            else:
+                log(f"Re-encounter: {name}")
+                status = info.get("status", "Unknown")
+                note = info.get("note", "")
+                msg = f"Re-encountering {name}."
+                parts = ["Re-encountering", name]
+                if status == "Clean":
+                    msg += " Still listed as Clean."
+                    parts.append("Still listed as Clean.")
+                elif status == "Bounty":
+                    msg += f" History says: {info.get('details','')}"
+                    parts += ["History says:", info.get('details','')]
+                if note:
+                    msg += f" Your Note: {note}"
+                    parts += ["Your Note:", note]
+                
+                metrics.inc("reencounters")
+                emit("reencounter", name=name, status=status, note=note)
+                speak(msg, parts)
+                players.update(name, time=current_time)
+                needs_check = False
+                active = True
+
+        if needs_check:
+            trace = metrics.start_trace(name)
+            metrics.inc("detections")
+            log(f"Queued: {name} [{trace}]")
+            emit("detection", region=region, name=name, trace=trace)
+            update_player_data(name, "Queued...") 
+            enqueue_lookup(name, "Proximity")
+            active = True
+    return active
+
+def handle_death(res_death, region="death"):
+    # Returns True when a new killer was announced
+    killer = analyze_death_screen(res_death) if res_death else None
+    # The killer line's own OCR confidence, so the still-screen rule can judge it
+    conf = next((line[2] for line in res_death if line[1] == killer), 1.0) if killer else 0.0
+    reads = [(clean_name(killer), conf)] if killer else []
+    stable = stabilizer_for(region).feed(reads, gate_for(region).last_changed)
+    killer = stable[0] if stable else None
+    need_scan = False
+    if killer:
+        clean_killer = name_index.resolve(killer)
+        
+        if len(clean_killer) > 2:
+            curr_t = time.time()
+            
+            info = players.get(clean_killer)
+            if info is None:
+                need_scan = True
+            else:
+                last_t = info.get("time", 0)
+                if curr_t - last_t > 300: 
+                    need_scan = True
+
+            if need_scan:
+                trace = metrics.start_trace(clean_killer)
+                metrics.inc("detections")
+                update_player_data(clean_killer, "Queued...", "Death Screen")
+                log(f"KILLED BY: {clean_killer} [{trace}]")
+                emit("detection", region=region, name=clean_killer, trace=trace)
+                speak(f"Killed by {clean_killer}. Checking record.", ["Killed by", clean_killer, "Checking record."], "Death")
+                enqueue_lookup(clean_killer, "Death")
+    return need_scan
+
+custom_text = {}   # region -> last text a custom region read
+
+def handle_custom(res, region):
+    # Free-text region: report what it reads whenever that changes
+    lines = [line[1] for line in sorted(res or [], key=lambda r: r[0][0][1]) if line[2] > 0.6]
+    text = " | ".join(lines)
+    if text == custom_text.get(region, ""): return False
+    custom_text[region] = text
+    if text:
+        log(f"{region}: {text}")
+        emit("text", region=region, lines=lines)
+    return bool(text)
+
+PARSER_HANDLERS = {"chat": handle_proximity, "death": handle_death, "custom": handle_custom}
+
+def run_handler(region, res):
+    # Returns True if the region showed activity worth speeding up for
+    active = PARSER_HANDLERS[region_parser(region)](res, region)
+    return bool(active or (gate_for(region).last_changed and res))
+
+def run_handlers(batch, preps):
+    # batch: (region, OCR result) pairs as they complete; each is calibrated
+    # and handled on arrival. Returns True if any region showed activity.
+    active = False
+    for region, res in batch:
+        # A failing handler must not abandon the batch either
+        try:
+            calibrate_preprocessors(preps, {region: res})
+            if run_handler(region, res): active = True
+        except Exception as e: print(f"Handler Error ({region}): {e}")
+    return active
+
 def background_loop():
-    global is_running, seen_players
+    global is_running, region_scheduler
     
     log("System Started.")
     init_engines()
-    seen_players = load_history()
+    ensure_history()
+    lookup_cache.load()
     
-    # Start the Worker Thread (Daemon)
-    threading.Thread(target=queue_worker, daemon=True).start()
+    # Start the lookup workers (Daemon)
+    start_workers()
     
     speak("Overlay Active.")
     
+    # One capture session for the whole run; buffers follow geometry_version
+    capture = CaptureSession()
+    ocr_pool = OcrExecutor()
+    capture_rate.reset()
+    geometry = None
+    
     while is_running:
         try:
-            with mss.mss() as sct:
-                monitor_idx = config.get("monitor_index", 1)
+            if geometry != geometry_version:
+                # First pass, or a region or the profile changed in the settings
+                geometry = geometry_version
+                specs = activate_regions(len(capture.sct.monitors) - 1)
+                rects = capture_regions(specs)
+                preps = {name: Preprocessor((rect["height"], rect["width"], 4), is_prox=specs[name]["parser"] != "death", region=name, options=specs[name])
+                         for name, rect in rects.items()}
+                region_scheduler = RegionScheduler(specs)
+                for gate in frame_gates.values(): gate.reset()
+                for stabilizer in stabilizers.values(): stabilizer.reset()
+                log(f"Profile {config.get('active_profile')}: " + (", ".join(f"{n} ({s['parser']}, monitor {s['monitor']})" for n, s in specs.items()) or "no regions"))
+            
+            due = region_scheduler.due()
+            if due:
+                t_tick = time.perf_counter()
+                views = capture.grab_all({region: rects[region] for region in due})
+                jobs = {}
+                for region in due:
+                    t1 = time.perf_counter()
+                    jobs[region] = preps[region].run(views[region])
+                    track_stage(region, "preprocess", time.perf_counter() - t1)
                 
-                # 1. Proximity
-                mon_prox = {"top": config['prox_y'], "left": config['prox_x'], "width": config['prox_w'], "height": config['prox_h'], "mon": monitor_idx}
-                img_prox = np.array(sct.grab(mon_prox))
-                proc_prox = preprocess_image(img_prox, is_prox=True)
-                res_prox, _ = ocr_engine(proc_prox)
+                metrics.inc("frames", len(jobs))
+                active = run_handlers(ocr_pool.run_batch(jobs), preps)
                 
-                if res_prox:
-                    for line in res_prox:
-                        text, conf = line[1], line[2]
-                        if conf > 0.6:
-                            name = ''.join(e for e in text if e.isalnum() or e == '_')
-                            if len(name) > 3 and name not in ["DETECTED", "SEARCHING", "Intel"]:
-                                
-                                # Re-encounter Logic
-                                current_time = time.time()
-                                needs_check = True
-                                
-                                if name in seen_players:
-                                    last_time = seen_players[name].get("time", 0)
-                                    if current_time - last_time < 1800: # 30 mins
-                                        needs_check = False
-                                    else:
-                                        log(f"Re-encounter: {name}")
-                                        status = seen_players[name].get("status", "Unknown")
-                                        note = seen_players[name].get("note", "")
-                                        msg = f"Re-encountering {name}."
-                                        if status == "Clean": msg += " Still listed as Clean."
-                                        elif status == "Bounty": msg += f" History says: {seen_players[name].get('details','')}"
-                                        if note: msg += f" Your Note: {note}"
-                                        
-                                        speak(msg)
-                                        seen_players[name]["time"] = current_time
-                                        save_history_disk()
-                                        needs_check = False
-
-                                if needs_check:
-                                    log(f"Queued: {name}")
-                                    update_player_data(name, "Queued...") 
-                                    search_queue.put((name, "Proximity"))
-
-                # 2. Death Screen
-                if int(time.time() * 10) % 5 == 0:
-                    mon_death = {"top": config['death_y'], "left": config['death_x'], "width": config['death_w'], "height": config['death_h'], "mon": monitor_idx}
-                    img_death = np.array(sct.grab(mon_death))
-                    
-                    proc_death = preprocess_image(img_death, is_prox=False)
-                    res_death, _ = ocr_engine(proc_death)
-                    
-                    if res_death:
-                        killer = analyze_death_screen(res_death)
-                        if killer:
-                            clean_killer = ''.join(e for e in killer if e.isalnum() or e == '_' or e == '-')
-                            
-                            if len(clean_killer) > 2:
-                                need_scan = False
-                                curr_t = time.time()
-                                
-                                if clean_killer not in seen_players:
-                                    need_scan = True
-                                else:
-                                    last_t = seen_players[clean_killer].get("time", 0)
-                                    if curr_t - last_t > 300: 
-                                        need_scan = True
-
-                                if need_scan:
-                                    update_player_data(clean_killer, "Queued...", "Death Screen")
-                                    log(f"KILLED BY: {clean_killer}")
-                                    speak(f"Killed by {clean_killer}. Checking record.")
-                                    search_queue.put((clean_killer, "Death"))
+                if capture_rate.update(active, time.perf_counter() - t_tick):
+                    region_scheduler.expedite()
 
-            time.sleep(0.5)
+            time.sleep(region_scheduler.sleep_time())
         except Exception as e:
             print(f"Loop Error: {e}")
+            time.sleep(0.5)
             
+    ocr_pool.shutdown()
+    capture.close()
+    history_store.flush()
     log("System Stopped.")
 
 # --- 5. GUI FUNCTIONS ---
@@ -454,6 +2608,12 @@ def get_preview_img(mon_idx_str, prox_x, prox_y, prox_w, prox_h, death_x, death_
         cv2.rectangle(img, (death_x, death_y), (death_x+death_w, death_y+death_h), (255, 0, 0), 4)
         cv2.putText(img, "DEATH SCREEN", (death_x, death_y-10), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 0, 0), 4)
         
+        # Any other regions of the active profile on this monitor
+        for name, spec in profile_regions().items():
+            if name in ("prox", "death") or spec["monitor"] != mon_idx: continue
+            cv2.rectangle(img, (spec["x"], spec["y"]), (spec["x"] + spec["w"], spec["y"] + spec["h"]), (255, 255, 0), 4)
+            cv2.putText(img, name.upper(), (spec["x"], spec["y"] - 10), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 0), 4)
+        
         return cv2.resize(img, (0,0), fx=0.3, fy=0.3)
 
 def save_settings(mon_str, aud_dev, voice_str, px, py, pw, ph, dx, dy, dw, dh, icrop):
@@ -462,57 +2622,131 @@ def save_settings(mon_str, aud_dev, voice_str, px, py, pw, ph, dx, dy, dw, dh, i
     try: a_idx = int(aud_dev.split(":")[0])
     except: a_idx = 0
     
+    global geometry_version
+    voice_changed = voice_str != config.get("tts_voice")
+    old_geometry = [config.get(k) for k in GEOMETRY_KEYS]
     config["monitor_index"] = m_idx
     config["audio_device"] = a_idx
     config["tts_voice"] = voice_str
+    if voice_changed and tts_model is not None:
+        threading.Thread(target=prerender_phrases, daemon=True).start()
     config["prox_x"] = px; config["prox_y"] = py; config["prox_w"] = pw; config["prox_h"] = ph
     config["death_x"] = dx; config["death_y"] = dy; config["death_w"] = dw; config["death_h"] = dh
     config["icon_crop"] = icrop
+    sync_legacy_regions()
+    if [config.get(k) for k in GEOMETRY_KEYS] != old_geometry: geometry_version += 1
     save_config_to_file()
     return "Configuration Saved!"
 
-def get_history_data():
-    load_history()
-    data = []
-    for name, info in seen_players.items():
-        if isinstance(info, dict):
-            t_str = time.strftime('%H:%M:%S', time.localtime(info.get('time', 0)))
-            ctx = info.get('status', 'Unknown')
-            details = info.get('details', '')
-            note = info.get('note', '')
-        else:
-            t_str = time.strftime('%H:%M:%S', time.localtime(info))
-            ctx = "Unknown"
-            details = ""
-            note = ""
-        data.append([t_str, name, ctx, details, note])
-    data.reverse()
-    return pd.DataFrame(data, columns=["Time", "Player", "Status", "Details", "My Notes"])
+def profile_json(name):
+    # A new name starts as a copy of the active profile
+    profile = config["profiles"].get(name) or config["profiles"][config["active_profile"]]
+    return json.dumps(profile.get("regions", []), indent=2)
+
+def save_profile(name, text):
+    # Returns the status plus updates for the profile dropdown and the prox/death sliders
+    global geometry_version
+    keep = [gr.skip()] * 10
+    name = (name or "").strip()
+    if not name: return ["Profile needs a name."] + keep
+    try: regions = parse_regions(json.loads(text or "[]"), monitor_count())
+    except ValueError as e: return [f"Not saved: {e}"] + keep
+    config["profiles"][name] = {"regions": regions}
+    config["active_profile"] = name
+    # The prox/death sliders follow the profile's regions of the same name
+    for region in regions:
+        if region.get("name") in ("prox", "death"):
+            key = region["name"]
+            config[f"{key}_x"], config[f"{key}_y"], config[f"{key}_w"], config[f"{key}_h"] = (int(region[k]) for k in ("x", "y", "w", "h"))
+            if key == "prox" and "icon_crop" in region: config["icon_crop"] = int(region["icon_crop"])
+    geometry_version += 1
+    save_config_to_file()
+    sliders = [config[k] for k in ("prox_x", "prox_y", "prox_w", "prox_h", "icon_crop", "death_x", "death_y", "death_w", "death_h")]
+    return [f"Profile {name} active with {len(regions)} regions.", gr.update(choices=list(config["profiles"]), value=name)] + sliders
+
+# History view: one page of the in-memory history at a time, filtered and
+# sorted on the server. The timer asks for a redraw every few seconds; each
+# browser session keeps the (version, query, sort, page) key its table last
+# got in a gr.State, and an unchanged key is answered before any history work.
+# A changed key resends the whole page (at most history_page_size rows)
+# rather than a row diff. No redraw is pushed while a cell is being edited.
+HISTORY_COLUMNS = ["Time", "Player", "Status", "Details", "My Notes"]
+HISTORY_SORTS = {
+    "Newest": (lambda item: item[1].get("time", 0), True),
+    "Oldest": (lambda item: item[1].get("time", 0), False),
+    "Name": (lambda item: item[0], False),
+    "Status": (lambda item: (item[1].get("status", ""), -item[1].get("time", 0)), False),
+}
+HISTORY_EDIT_HOLD = 30   # seconds a selected cell holds off timer redraws
+
+def history_row(name, info):
+    t_str = time.strftime('%H:%M:%S', time.localtime(info.get('time', 0)))
+    return [t_str, name, info.get('status', 'Unknown'), info.get('details', ''), info.get('note', '')]
+
+def get_history_page(query="", sort="Newest", page=1, shown=None, force=True):
+    # shown: key this session's table last got. Returns table, label, page, key
+    ensure_history()
+    version = players.version
+    query = (query or "").strip().upper()
+    try: page = max(1, int(page or 1))
+    except (TypeError, ValueError): page = 1
+    if not force and shown == (version, query, sort, page):
+        return gr.skip(), gr.skip(), gr.skip(), gr.skip()
+    size = max(1, int(config.get("history_page_size", 50)))
+    items = list(players.snapshot().items())
+    if query:
+        items = [item for item in items if query in item[0].upper() or
+                 query in str(item[1].get("details", "")).upper() or query in str(item[1].get("note", "")).upper()]
+    pages = max(1, -(-len(items) // size))
+    page = min(page, pages)
+    
+    sort_key, newest_first = HISTORY_SORTS.get(sort, HISTORY_SORTS["Newest"])
+    wanted = page * size
+    # Only the rows up to this page need ordering
+    if wanted < len(items):
+        top = heapq.nlargest(wanted, items, key=sort_key) if newest_first else heapq.nsmallest(wanted, items, key=sort_key)
+    else:
+        top = sorted(items, key=sort_key, reverse=newest_first)
+    rows = [history_row(name, info) for name, info in top[(page - 1) * size:wanted]]
+    label = f"Page {page} / {pages} · {len(items)} players"
+    return pd.DataFrame(rows, columns=HISTORY_COLUMNS), label, page, (version, query, sort, page)
+
+def poll_history_page(query, sort, page, shown, editing):
+    # editing: when this session last selected a cell (0 once the edit landed)
+    if time.time() - (editing or 0) < HISTORY_EDIT_HOLD:
+        return gr.skip(), gr.skip(), gr.skip(), gr.skip()
+    return get_history_page(query, sort, page, shown, force=False)
 
 def clear_history_data():
-    global seen_players
-    seen_players = {}
-    save_history_disk()
-    return get_history_data()
+    players.clear()
+    history_store.clear()
+    lookup_cache.clear()
+    name_index.rebuild({})
 
 def save_grid_changes(df):
-    global seen_players
+    # Only rows whose note differs from memory are written back
     if df is None or df.empty: return
-    
-    # Iterate over the rows of the edited dataframe
-    for index, row in df.iterrows():
-        name = row['Player']
-        new_note = row['My Notes']
-        
-        # Update the main dictionary if the note changed
-        if name in seen_players:
-            # Only update if it's actually different to save disk writes
-            if seen_players[name]['note'] != new_note:
-                seen_players[name]['note'] = new_note
-                save_history_disk()
+    for name, new_note in zip(df['Player'], df['My Notes']):
+        info = players.get(name)
+        if info is not None and info.get('note', '') != new_note:
+            players.update(name, note=new_note)
 
 def update_log_display():
-    return "\n".join(console_log)
+    return "\n".join(reversed(console_log))
+
+def get_stats_display():
+    lines = [gate.summary() for gate in frame_gates.values()]
+    if region_scheduler: lines.append("Scan: " + region_scheduler.summary())
+    if is_running: lines.append(capture_rate.summary())
+    lines.append(row_cache.summary())
+    lines.append(players.summary() + " | " + name_index.summary())
+    lines += [stabilizer.summary() for stabilizer in stabilizers.values()]
+    lines.append(summarizer.summary() + " | Verdicts: " + (", ".join(f"{k} {v}" for k, v in verdict_sources.items()) or "none yet"))
+    lines.append(queue_summary())
+    lines.append(lookup_cache.summary())
+    lines.append(audio_cache.summary())
+    lines.append(speech_scheduler.summary())
+    return "\n".join(lines)
 
 def check_status_on_load():
     return "Running 🟢" if is_running else "Stopped 🔴"
@@ -521,107 +2755,501 @@ def check_status_on_load():
 
 load_config() 
 
-# Define Blue Theme
-blue_theme = gr.themes.Default(
-    primary_hue="blue", 
-    secondary_hue="cyan"
-)
-
-# REMOVED theme=... FROM HERE
-with gr.Blocks(title="DOOD BOY") as app:
-    gr.Markdown("# 🐕 GOOD BOY")
-    gr.Markdown("### Created by [WiredGeist](https://github.com/WiredGeist)")
-    
-    with gr.Tabs():
-        # --- DASHBOARD ---
-        with gr.Tab("Live Dashboard"):
-            with gr.Row():
-                btn_start = gr.Button("▶ START SYSTEM", variant="primary")
-                btn_stop = gr.Button("⏹ STOP SYSTEM", variant="stop")
+def build_app():
+    # Define Blue Theme
+    blue_theme = gr.themes.Default(
+        primary_hue="blue", 
+        secondary_hue="cyan"
+    )
+
+    with gr.Blocks(title="DOOD BOY") as app:
+        gr.Markdown("# 🐕 GOOD BOY")
+        gr.Markdown("### Created by [WiredGeist](https://github.com/WiredGeist)")
+    
+        with gr.Tabs():
+            # --- DASHBOARD ---
+            with gr.Tab("Live Dashboard"):
+                with gr.Row():
+                    btn_start = gr.Button("▶ START SYSTEM", variant="primary")
+                    btn_stop = gr.Button("⏹ STOP SYSTEM", variant="stop")
             
-            status_indicator = gr.Label(value="Checking Status...", label="System Status")
+                status_indicator = gr.Label(value="Checking Status...", label="System Status")
+                readiness_output = gr.Textbox(label="Startup", lines=3, interactive=False)
             
-            with gr.Row():
-                with gr.Column(scale=1):
-                    log_output = gr.Textbox(label="System Log", lines=15, interactive=False)
+                with gr.Row():
+                    with gr.Column(scale=1):
+                        log_output = gr.Textbox(label="System Log", lines=15, interactive=False)
+                        stats_output = gr.Textbox(label="Pipeline Stats", lines=15, interactive=False)
+                    metrics_output = gr.Textbox(label="Stage Latency & Counters", lines=12, interactive=False)
                 
-                with gr.Column(scale=2):
-                    gr.Markdown("### 📝 Player Notes")
-                    with gr.Row():
-                        txt_player_name = gr.Textbox(label="Player Name")
-                        txt_note = gr.Textbox(label="Note (e.g. 'Friendly', 'KOS')")
-                        btn_add_note = gr.Button("Add/Update Note")
-                    lbl_note_status = gr.Label(label="Note Status")
+                    with gr.Column(scale=2):
+                        gr.Markdown("### 📝 Player Notes")
+                        with gr.Row():
+                            txt_player_name = gr.Textbox(label="Player Name")
+                            txt_note = gr.Textbox(label="Note (e.g. 'Friendly', 'KOS')")
+                            btn_add_note = gr.Button("Add/Update Note")
+                        lbl_note_status = gr.Label(label="Note Status")
                     
-                    gr.Markdown("### 📜 Session History")
-                    with gr.Row():
-                        btn_refresh = gr.Button("🔄 Refresh List", variant="secondary")
+                        gr.Markdown("### 📜 Session History")
+                        with gr.Row():
+                            txt_history_search = gr.Textbox(label="Search", placeholder="Name, details or note")
+                            dd_history_sort = gr.Dropdown(choices=list(HISTORY_SORTS), value="Newest", label="Sort")
+                        with gr.Row():
+                            btn_prev_page = gr.Button("◀ Prev", variant="secondary")
+                            num_history_page = gr.Number(value=1, precision=0, label="Page", minimum=1)
+                            btn_next_page = gr.Button("Next ▶", variant="secondary")
+                            lbl_history_page = gr.Markdown("")
+                            btn_refresh = gr.Button("🔄 Refresh List", variant="secondary")
                     
-                    history_df = gr.DataFrame(
-                        headers=["Time", "Player", "Status", "Details", "My Notes"], 
-                        interactive=True,
-                        datatype=["str", "str", "str", "str", "str"]
-                    )
-
-                    history_df.change(save_grid_changes, inputs=history_df, outputs=None)
-
-        # --- SETTINGS ---
-        with gr.Tab("Settings & Calibration"):
-            gr.Markdown("### ⚙️ General Setup")
-            with gr.Row():
-                dd_monitor = gr.Dropdown(choices=get_monitor_list(), label="Game Monitor", value=get_monitor_list()[0] if get_monitor_list() else None)
-                dd_audio = gr.Dropdown(choices=get_audio_devices(), label="Output Device (Voicemeeter)", value=None)
-                dd_voice = gr.Dropdown(choices=KITTEN_VOICES, label="AI Voice", value=config.get("tts_voice", "expr-voice-2-f"))
+                        history_df = gr.DataFrame(
+                            headers=["Time", "Player", "Status", "Details", "My Notes"], 
+                            interactive=True,
+                            datatype=["str", "str", "str", "str", "str"]
+                        )
+
+                        history_shown = gr.State(None)     # key of the page this session shows
+                        history_editing = gr.State(0.0)    # time a cell was selected for editing
+                        history_df.select(lambda: time.time(), inputs=None, outputs=history_editing)
+                        history_df.input(save_grid_changes, inputs=history_df, outputs=None).then(lambda: 0.0, inputs=None, outputs=history_editing)
+
+            # --- SETTINGS ---
+            with gr.Tab("Settings & Calibration"):
+                gr.Markdown("### ⚙️ General Setup")
+                with gr.Row():
+                    dd_monitor = gr.Dropdown(choices=get_monitor_list(), label="Game Monitor", value=get_monitor_list()[0] if get_monitor_list() else None)
+                    dd_audio = gr.Dropdown(choices=get_audio_devices(), label="Output Device (Voicemeeter)", value=None)
+                    dd_voice = gr.Dropdown(choices=KITTEN_VOICES, label="AI Voice", value=config.get("tts_voice", "expr-voice-2-f"))
             
-            with gr.Row():
-                with gr.Column():
-                    gr.Markdown("### 🟩 Proximity Chat (Left)")
-                    sl_px = gr.Slider(0, 2560, value=config["prox_x"], label="X Pos")
-                    sl_py = gr.Slider(0, 1440, value=config["prox_y"], label="Y Pos")
-                    sl_pw = gr.Slider(10, 500, value=config["prox_w"], label="Width")
-                    sl_ph = gr.Slider(10, 200, value=config["prox_h"], label="Height")
-                    sl_crop = gr.Slider(0, 100, value=config["icon_crop"], label="Icon Crop (Left)")
+                with gr.Row():
+                    with gr.Column():
+                        gr.Markdown("### 🟩 Proximity Chat (Left)")
+                        sl_px = gr.Slider(0, 2560, value=config["prox_x"], label="X Pos")
+                        sl_py = gr.Slider(0, 1440, value=config["prox_y"], label="Y Pos")
+                        sl_pw = gr.Slider(10, 500, value=config["prox_w"], label="Width")
+                        sl_ph = gr.Slider(10, 200, value=config["prox_h"], label="Height")
+                        sl_crop = gr.Slider(0, 100, value=config["icon_crop"], label="Icon Crop (Left)")
                 
-                with gr.Column():
-                    gr.Markdown("### 🟥 Death Screen (Center)")
-                    sl_dx = gr.Slider(0, 2560, value=config["death_x"], label="X Pos")
-                    sl_dy = gr.Slider(0, 1440, value=config["death_y"], label="Y Pos")
-                    sl_dw = gr.Slider(10, 800, value=config["death_w"], label="Width")
-                    sl_dh = gr.Slider(10, 400, value=config["death_h"], label="Height")
-
-            btn_preview = gr.Button("📸 Take Screenshot & Show Boxes")
-            img_preview = gr.Image(label="Calibration Preview", interactive=False)
+                    with gr.Column():
+                        gr.Markdown("### 🟥 Death Screen (Center)")
+                        sl_dx = gr.Slider(0, 2560, value=config["death_x"], label="X Pos")
+                        sl_dy = gr.Slider(0, 1440, value=config["death_y"], label="Y Pos")
+                        sl_dw = gr.Slider(10, 800, value=config["death_w"], label="Width")
+                        sl_dh = gr.Slider(10, 400, value=config["death_h"], label="Height")
+
+                btn_preview = gr.Button("📸 Take Screenshot & Show Boxes")
+                img_preview = gr.Image(label="Calibration Preview", interactive=False)
             
-            btn_save = gr.Button("💾 Save Configuration", variant="primary")
-            lbl_save = gr.Label(label="Last Action")
+                btn_save = gr.Button("💾 Save Configuration", variant="primary")
+                lbl_save = gr.Label(label="Last Action")
+                
+                gr.Markdown("### 🗂️ Capture Profiles")
+                with gr.Row():
+                    dd_profile = gr.Dropdown(choices=list(config["profiles"]), value=config["active_profile"], label="Profile (type a new name to create one)", allow_custom_value=True)
+                    btn_profile_save = gr.Button("💾 Save & Activate Profile", variant="primary")
+                code_profile = gr.Code(value=profile_json(config["active_profile"]), language="json",
+                                       label="Regions: name, parser (chat / death / custom), monitor, x, y, w, h; optional interval, icon_crop, preprocess_mode, threshold_mode, ocr_text_height, enabled")
+                lbl_profile = gr.Label(label="Profile Status")
             
-            gr.Markdown("### ⚠ Debugging Zone")
-            with gr.Row():
-                 btn_clear = gr.Button("🗑️ ERASE ALL HISTORY (Debug Only)", variant="stop")
+                gr.Markdown("### ⚠ Debugging Zone")
+                with gr.Row():
+                     btn_clear = gr.Button("🗑️ ERASE ALL HISTORY (Debug Only)", variant="stop")
 
-    # --- EVENTS ---
-    app.load(check_status_on_load, outputs=status_indicator)
+        # --- EVENTS ---
+        app.load(check_status_on_load, outputs=status_indicator)
     
-    btn_start.click(lambda: toggle_system(True), outputs=status_indicator)
-    btn_stop.click(lambda: toggle_system(False), outputs=status_indicator)
+        btn_start.click(lambda: toggle_system(True), outputs=status_indicator)
+        btn_stop.click(lambda: toggle_system(False), outputs=status_indicator)
     
-    timer_log = gr.Timer(1)
-    timer_log.tick(update_log_display, outputs=log_output)
+        timer_log = gr.Timer(1)
+        timer_log.tick(update_log_display, outputs=log_output)
+        timer_log.tick(get_stats_display, outputs=stats_output)
+        timer_log.tick(get_readiness_display, outputs=readiness_output)
+        timer_log.tick(metrics.summary, outputs=metrics_output)
     
-    btn_refresh.click(get_history_data, outputs=history_df)
+        history_view = [txt_history_search, dd_history_sort, num_history_page]
+        history_out = [history_df, lbl_history_page, num_history_page, history_shown]
+        btn_refresh.click(get_history_page, inputs=history_view, outputs=history_out)
+        txt_history_search.change(lambda q, s: get_history_page(q, s, 1), inputs=history_view[:2], outputs=history_out)
+        dd_history_sort.change(lambda q, s: get_history_page(q, s, 1), inputs=history_view[:2], outputs=history_out)
+        num_history_page.submit(get_history_page, inputs=history_view, outputs=history_out)
+        btn_prev_page.click(lambda q, s, p: get_history_page(q, s, (p or 1) - 1), inputs=history_view, outputs=history_out)
+        btn_next_page.click(lambda q, s, p: get_history_page(q, s, (p or 1) + 1), inputs=history_view, outputs=history_out)
+        timer_history = gr.Timer(3)
+        timer_history.tick(poll_history_page, inputs=history_view + [history_shown, history_editing], outputs=history_out)
+        app.load(get_history_page, inputs=history_view, outputs=history_out)
     
-    btn_clear.click(clear_history_data, outputs=history_df)
+        btn_clear.click(clear_history_data).then(get_history_page, inputs=history_view, outputs=history_out)
     
-    btn_add_note.click(add_user_note, inputs=[txt_player_name, txt_note], outputs=lbl_note_status)
+        btn_add_note.click(add_user_note, inputs=[txt_player_name, txt_note], outputs=lbl_note_status)
     
-    btn_preview.click(get_preview_img, 
-                      inputs=[dd_monitor, sl_px, sl_py, sl_pw, sl_ph, sl_dx, sl_dy, sl_dw, sl_dh],
-                      outputs=img_preview)
+        btn_preview.click(get_preview_img, 
+                          inputs=[dd_monitor, sl_px, sl_py, sl_pw, sl_ph, sl_dx, sl_dy, sl_dw, sl_dh],
+                          outputs=img_preview)
     
-    btn_save.click(save_settings,
-                   inputs=[dd_monitor, dd_audio, dd_voice, sl_px, sl_py, sl_pw, sl_ph, sl_dx, sl_dy, sl_dw, sl_dh, sl_crop],
-                   outputs=lbl_save)
+        btn_save.click(save_settings,
+                       inputs=[dd_monitor, dd_audio, dd_voice, sl_px, sl_py, sl_pw, sl_ph, sl_dx, sl_dy, sl_dw, sl_dh, sl_crop],
+                       outputs=lbl_save)
+        
+        dd_profile.change(profile_json, inputs=dd_profile, outputs=code_profile)
+        btn_profile_save.click(save_profile, inputs=[dd_profile, code_profile],
+                               outputs=[lbl_profile, dd_profile, sl_px, sl_py, sl_pw, sl_ph, sl_crop, sl_dx, sl_dy, sl_dw, sl_dh])
+
+    return app, blue_theme
+
+# --- 7. BENCHMARK ---
+# python main.py --bench [--frames DIR] [--site URL] [--save-baseline]
+# Replays screenshots through preprocessing, OCR and the death parser, runs
+# check_bounty against the bundled stand-in site with FakeGeminiClient, and
+# times speech synthesis with audio output off. DIR holds prox_*.png and
+# death_*.png (plus an optional labels.json {file: [names]} for accuracy);
+# without it synthetic frames with known names are used. Every stage's p95
+# is compared with BENCH_BASELINE and anything more than bench_tolerance
+# slower is flagged (exit code 1).
+BENCH_BASELINE = "bench_baseline.json"
+BENCH_NAMES = ["RAIDER_01", "SNEAKYPETE", "QUIETONE", "NOBODY_HOME"]
+BENCH_PHRASES = [
+    ("Raider Night_Owl is not listed.", ["Raider", "Night_Owl", "is not listed."]),
+    ("Killed by Scrapper77. Checking record.", ["Killed by", "Scrapper77", "Checking record."]),
+    ("SNEAKYPETE is listed for Friendly Fire.", None),
+]
+
+def percentile(samples, q):
+    if not samples: return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def synthetic_frames(count=40):
+    # (region, BGRA image, expected names) shaped like the configured regions
+    names = ["Raider_01", "SneakyPete", "QuietOne", "Bob_the_Raider", "Night_Owl", "Scrapper77"]
+    frames = []
+    for i in range(count):
+        prox = np.zeros((config["prox_h"], config["prox_w"], 4), dtype=np.uint8)
+        prox[:] = (40, 30, 20, 255)
+        shown = [names[(i + k) % len(names)] for k in range(3)]
+        for row, name in enumerate(shown):
+            cv2.putText(prox, name, (25, 28 + row * 36), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (230, 230, 230, 255), 1, cv2.LINE_AA)
+        frames.append(("prox", prox, shown))
+        
+        death = np.zeros((config["death_h"], config["death_w"], 4), dtype=np.uint8)
+        killer = names[i % len(names)]
+        cv2.putText(death, "KNOCKED OUT BY", (40, 80), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255, 255), 2, cv2.LINE_AA)
+        cv2.putText(death, killer, (40, 140), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255, 255), 2, cv2.LINE_AA)
+        frames.append(("death", death, [killer]))
+    return frames
+
+def load_frames(folder):
+    labels = {}
+    try:
+        with open(os.path.join(folder, "labels.json"), 'r') as f: labels = json.load(f)
+    except: pass
+    frames = []
+    for region in ("prox", "death"):
+        for path in sorted(Path(folder).glob(f"{region}_*.png")):
+            img = cv2.imread(str(path), cv2.IMREAD_UNCHANGED)
+            if img is None: continue
+            if img.ndim == 2: img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGRA)
+            elif img.shape[2] == 3: img = cv2.cvtColor(img, cv2.COLOR_BGR2BGRA)
+            frames.append((region, img, labels.get(path.name)))
+    return frames
+
+def bench_vision(frames, engine):
+    samples = {f"{region} {stage}": [] for region in ("prox", "death") for stage in ("preprocess", "ocr")}
+    samples["death parse"] = []
+    preps = {}
+    hits = expected = 0
+    
+    def run(region, img, record=True):
+        key = (region, img.shape)
+        if key not in preps: preps[key] = Preprocessor(img.shape, is_prox=region == "prox")
+        t0 = time.perf_counter()
+        binary = preps[key].run(img)
+        t1 = time.perf_counter()
+        if region == "prox":
+            # Every frame pays for recognition, as a new row would
+            row_cache.entries.clear()
+            if config.get("prox_ocr_mode", "rows") == "rows": res = recognize_rows(engine, binary)
+            else: res = engine(binary)[0]
+            t2 = time.perf_counter()
+            found = {name for name, _ in read_prox_names(res)}
+            preps[key].calibrate(res)
+        else:
+            res = engine(binary)[0] or []
+            t2 = time.perf_counter()
+            killer = analyze_death_screen(res)
+            t3 = time.perf_counter()
+            found = {clean_name(killer)} if killer else set()
+            if record: samples["death parse"].append(t3 - t2)
+            if killer: preps[key].calibrate(res)
+        if record:
+            samples[f"{region} preprocess"].append(t1 - t0)
+            samples[f"{region} ocr"].append(t2 - t1)
+        return found
+    
+    t_start = time.perf_counter()
+    for region, img, names in frames:
+        found = run(region, img)
+        if names:
+            wanted = {clean_name(name) for name in names}
+            expected += len(wanted)
+            hits += len(wanted & found)
+    fps = len(frames) / max(time.perf_counter() - t_start, 1e-9)
+    
+    # Separate pass for allocations so tracing doesn't skew the timings
+    peaks = {"prox": [], "death": []}
+    tracemalloc.start()
+    for region, img, _ in frames[:20]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run(region, img, record=False)
+        peaks[region].append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    alloc = {region: sum(p) / len(p) / 1024 for region, p in peaks.items() if p}
+    accuracy = hits / expected if expected else None
+    return samples, fps, accuracy, alloc
+
+def bench_lookups(site, rounds=2):
+    samples = {"lookup": []}
+    summarizer.client_factory = lambda: FakeGeminiClient(delay=0.3)
+    summarizer.client = None
+    browser = BrowserService(url=site, pool_size=1)
+    try: browser.start()
+    except Exception as e: return samples, f"Lookups skipped: {str(e).splitlines()[0]}"
+    failed = 0
+    try:
+        for _ in range(rounds):
+            for name in BENCH_NAMES:
+                lookup_cache.clear()
+                t0 = time.perf_counter()
+                check_bounty(name, "Proximity", browser)
+                samples["lookup"].append(time.perf_counter() - t0)
+                if not lookup_cache.get(name): failed += 1
+    finally:
+        browser.stop()
+    return samples, f"Lookups: {len(samples['lookup'])} run, {failed} without a verdict | {summarizer.summary()}"
+
+def bench_speech(rounds=3):
+    samples = {"speech cold": [], "speech cached": []}
+    if tts_model is None: return samples
+    for _ in range(rounds):
+        for text, parts in BENCH_PHRASES:
+            audio_cache.clear()
+            t0 = time.perf_counter()
+            render_speech(text, parts)
+            samples["speech cold"].append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            render_speech(text, parts)
+            samples["speech cached"].append(time.perf_counter() - t0)
+    return samples
+
+def standin_url(delay_ms=50):
+    return (Path(__file__).resolve().parent / "standin" / "index.html").as_uri() + f"?delay={delay_ms}"
+
+def use_scratch_state(prefix):
+    # Point history and lookup cache at a throwaway directory and mute audio
+    global history_store, audio_enabled
+    audio_enabled = False
+    scratch = tempfile.mkdtemp(prefix=prefix)
+    # No legacy path: a scratch store must never import (and rename) the real JSON history
+    history_store = HistoryStore(os.path.join(scratch, "history.db"), None)
+    lookup_cache.flush()
+    lookup_cache.path = os.path.join(scratch, "cache.json")
+    return scratch
+
+def run_bench(frames_dir=None, site=None, save_baseline=False):
+    # Nothing the benchmark looks up or says may touch the real history,
+    # cache or speakers
+    use_scratch_state("goodboy-bench-")
+    site = site or standin_url()
+    
+    init_engines()
+    frames = load_frames(frames_dir) if frames_dir else synthetic_frames()
+    print(f"Benchmark: {len(frames)} frames from {frames_dir or 'synthetic set'} | site {site}")
+    
+    samples, fps, accuracy, alloc = bench_vision(frames, ocr_engine)
+    print(f"Preprocess: {config.get('preprocess_mode', 'fast')} | threshold {config.get('threshold_mode', 'fixed')} | scale " +
+          ", ".join(f"{region} {scale:.2f}" for region, scale in preprocess_scales.items()))
+    lookup_samples, lookup_note = bench_lookups(site)
+    samples.update(lookup_samples)
+    samples.update(bench_speech())
+    
+    results = {"stages": {}, "fps": fps, "accuracy": accuracy, "alloc_kb": alloc}
+    for stage, values in samples.items():
+        if values:
+            results["stages"][stage] = {"n": len(values), "p50": percentile(values, 50) * 1000, "p95": percentile(values, 95) * 1000}
+    
+    baseline = None
+    if os.path.exists(BENCH_BASELINE):
+        try:
+            with open(BENCH_BASELINE, 'r') as f: baseline = json.load(f)
+        except: baseline = None
+    tolerance = config.get("bench_tolerance", 0.2)
+    regressions = []
+    
+    print(f"{'stage':<18} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'base p95':>9}")
+    for stage, r in results["stages"].items():
+        base = (baseline or {}).get("stages", {}).get(stage)
+        flag = ""
+        # Ignore sub-millisecond wobble on very fast stages
+        if base and r["p95"] > base["p95"] * (1 + tolerance) and r["p95"] - base["p95"] > 1.0:
+            flag = "  << REGRESSION"
+            regressions.append(stage)
+        base_str = f"{base['p95']:9.2f}" if base else f"{'-':>9}"
+        print(f"{stage:<18} {r['n']:>5} {r['p50']:9.2f} {r['p95']:9.2f} {base_str}{flag}")
+    
+    line = f"Frames/s: {fps:.1f}"
+    if baseline and fps < baseline.get("fps", 0) * (1 - tolerance):
+        line += "  << REGRESSION"
+        regressions.append("fps")
+    print(line)
+    if accuracy is not None:
+        line = f"Name accuracy: {accuracy * 100:.1f}%"
+        if baseline and baseline.get("accuracy") is not None and accuracy < baseline["accuracy"] - 0.02:
+            line += "  << REGRESSION"
+            regressions.append("accuracy")
+        print(line)
+    print("Allocations per frame: " + ", ".join(f"{region} {kb:.0f} KB peak" for region, kb in alloc.items()))
+    print(lookup_note)
+    
+    if save_baseline:
+        with open(BENCH_BASELINE, 'w') as f: json.dump(results, f, indent=2)
+        print(f"Baseline saved to {BENCH_BASELINE}.")
+    elif baseline is None:
+        print("No baseline yet; run with --save-baseline to store one.")
+    if regressions: print("Regressions: " + ", ".join(regressions))
+    return 1 if regressions else 0
+
+# --- 8. HEADLESS REPLAY ---
+# python main.py --headless --source VIDEO_OR_DIR [--lookups [--site URL] [--fake-gemini]]
+# Runs recorded full-screen frames through the same preprocessing, OCR,
+# handlers and lookup queue as the live loop, as fast as they decode, with
+# audio off. The active profile's regions are cropped from each frame. Detections, re-encounters and verdicts go to stdout (or
+# --output) as JSON lines; the log goes to stderr.
+REPLAY_IMAGE_TYPES = (".png", ".jpg", ".jpeg", ".bmp")
+
+def iter_frames(source, step=1):
+    # Yields (index, label, BGR frame) one at a time
+    if os.path.isdir(source):
+        files = sorted(p for p in Path(source).iterdir() if p.suffix.lower() in REPLAY_IMAGE_TYPES)
+        for index, path in enumerate(files):
+            if index % step: continue
+            img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+            if img is not None: yield index, path.name, img
+        return
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened(): raise ValueError(f"Cannot open {source}")
+    index = 0
+    try:
+        while True:
+            if index % step:
+                # grab() skips decoding frames we don't look at
+                if not cap.grab(): break
+            else:
+                ok, img = cap.read()
+                if not ok: break
+                yield index, f"{cap.get(cv2.CAP_PROP_POS_MSEC) / 1000:.2f}s", img
+            index += 1
+    finally:
+        cap.release()
+
+def crop_region(img, x, y, w, h):
+    view = img[max(0, y):max(0, y + h), max(0, x):max(0, x + w)]
+    return view if view.size else None
+
+def run_headless(source, lookups=False, site=None, fake_gemini=False, output=None, step=1, keep_history=False):
+    global event_sink, lookups_enabled, audio_enabled
+    sink = open(output, 'w') if output else sys.stdout
+    # stdout carries the JSON lines; everything printed goes to stderr
+    sys.stdout = sys.stderr
+    event_sink = sink
+    if keep_history: audio_enabled = False
+    else: use_scratch_state("goodboy-replay-")
+    lookups_enabled = lookups
+    if lookups:
+        if site: config["bounty_url"] = site
+        if fake_gemini: summarizer.client_factory = FakeGeminiClient
+    
+    init_engines(tts=False)
+    ensure_history()
+    lookup_cache.load()
+    if lookups: start_workers()
+    ocr_pool = OcrExecutor()
+    # Every region of the active profile is cropped from the same frame,
+    # whichever monitor it is configured on
+    specs = activate_regions()
+    # Output depends only on the frames: start from empty gates, votes and row
+    # cache. Nothing on the vision path is timed by the wall clock; a frame
+    # the gate skips is judged by the still-screen rule, not by elapsed time.
+    for gate in frame_gates.values(): gate.reset()
+    for stabilizer in stabilizers.values(): stabilizer.reset()
+    row_cache.entries.clear()
+    custom_text.clear()
+    preps = {}
+    frames = 0
+    t_start = time.perf_counter()
+    try:
+        for index, label, img in iter_frames(source, max(1, step)):
+            event_context.update(frame=index, at=label)
+            jobs = {}
+            used = {}
+            for region, spec in specs.items():
+                crop = crop_region(img, spec["x"], spec["y"], spec["w"], spec["h"])
+                if crop is None: continue
+                key = (region, crop.shape)
+                if key not in preps: preps[key] = Preprocessor(crop.shape, is_prox=spec["parser"] != "death", region=region, options=spec)
+                used[region] = preps[key]
+                t0 = time.perf_counter()
+                jobs[region] = preps[key].run(crop)
+                track_stage(region, "preprocess", time.perf_counter() - t0)
+            metrics.inc("frames", len(jobs))
+            run_handlers(ocr_pool.run_batch(jobs), used)
+            frames += 1
+        
+        if lookups:
+            # Let queued lookups finish before reporting
+            deadline = time.time() + config.get("lookup_deadline", 10) * max(1, search_queue.qsize() + len(inflight_names))
+            while (search_queue.unfinished_tasks or inflight_names) and time.time() < deadline: time.sleep(0.1)
+    finally:
+        ocr_pool.shutdown()
+        history_store.flush()
+        elapsed = time.perf_counter() - t_start
+        event_context.clear()
+        emit("summary", frames=frames, seconds=round(elapsed, 2), fps=round(frames / max(elapsed, 1e-9), 2), players=len(players))
+        event_sink = None
+        if output: sink.close()
+    return 0
 
 if __name__ == "__main__":
-    # ADDED THEME HERE
-    app.launch(inbrowser=True, theme=blue_theme)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="GOOD BOY overlay")
+    parser.add_argument("--bench-audio", action="store_true", help="compare audio post-processing paths")
+    parser.add_argument("--bench", action="store_true", help="benchmark the capture, OCR, lookup and speech stages")
+    parser.add_argument("--frames", help="folder of recorded prox_*.png / death_*.png screenshots for --bench")
+    parser.add_argument("--site", help="bounty site URL for --bench / --headless (default: the bundled stand-in)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this --bench run as the baseline")
+    parser.add_argument("--preprocess", choices=["fast", "legacy"], help="override preprocess_mode for this run")
+    parser.add_argument("--threshold", choices=["fixed", "otsu", "adaptive"], help="override threshold_mode for this run")
+    parser.add_argument("--headless", action="store_true", help="replay recorded frames without the UI")
+    parser.add_argument("--source", help="video file or image folder for --headless")
+    parser.add_argument("--lookups", action="store_true", help="run bounty lookups during --headless")
+    parser.add_argument("--fake-gemini", action="store_true", help="summarize with the offline FakeGeminiClient")
+    parser.add_argument("--output", help="write --headless events here instead of stdout")
+    parser.add_argument("--step", type=int, default=1, help="process every Nth frame in --headless")
+    parser.add_argument("--keep-history", action="store_true", help="let --headless update the real history and cache")
+    args = parser.parse_args()
+    if args.preprocess: config["preprocess_mode"] = args.preprocess
+    if args.threshold: config["threshold_mode"] = args.threshold
+    
+    if args.bench_audio:
+        benchmark_audio_post()
+    elif args.bench:
+        sys.exit(run_bench(args.frames, args.site, args.save_baseline))
+    elif args.headless:
+        if not args.source: parser.error("--headless needs --source")
+        sys.exit(run_headless(args.source, args.lookups, args.site or (standin_url() if args.lookups else None),
+                              args.fake_gemini, args.output, args.step, args.keep_history))
+    else:
+        app, blue_theme = build_app()
+        startup_times["UI built"] = time.perf_counter() - STARTUP_T0
+        start_warmup()
+        start_metrics_server()
+        # ADDED THEME HERE
+        app.launch(inbrowser=True, theme=blue_theme)
\ No newline at end of file